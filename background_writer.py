@@ -0,0 +1,82 @@
+import atexit
+import logging
+import threading
+from typing import Callable, Optional
+
+from metrics import METRICS
+from typechecking import typechecked
+
+
+@typechecked
+class BackgroundWriter:
+    """Runs file writes on a background thread, so the thread asking questions never waits on disk.
+
+    Writes are submitted with a key, usually the file name: a write submitted while another one of
+    the same key is still pending replaces it, so rapid updates of a file end in a single write of
+    its last version. Writes of different keys run in submission order. Pending writes are flushed
+    by flush, close and at interpreter exit.
+    """
+
+    def __init__(self):
+        self.__pending = {}  # type: dict[str, Callable]
+        self.__condition = threading.Condition()
+        self.__running = False
+        self.__thread = None
+        self.__error = None  # type: Optional[BaseException]
+        self.__closed = False
+
+    def submit(self, key: str, write: Callable):
+        """write() is called on the background thread, it must not use state the caller keeps changing."""
+        with self.__condition:
+            if self.__closed:
+                raise ValueError("writer closed")
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="BackgroundWriter", daemon=True)
+                self.__thread.start()
+                atexit.register(self.close)
+            if self.__pending.pop(key, None) is not None:
+                METRICS.increment("background_writes_coalesced")
+            self.__pending[key] = write
+            self.__condition.notify_all()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__pending and not self.__closed:
+                    self.__condition.wait()
+                if not self.__pending:
+                    return
+                key = next(iter(self.__pending))
+                write = self.__pending.pop(key)
+                self.__running = True
+            try:
+                write()
+            except BaseException as error:
+                logging.exception(f"background write of {key} failed")
+                self.__error = error
+            finally:
+                with self.__condition:
+                    self.__running = False
+                    self.__condition.notify_all()
+
+    def flush(self):
+        """Wait for the pending writes, raising the error of a failed one."""
+        with self.__condition:
+            while self.__pending or self.__running:
+                self.__condition.wait()
+            error, self.__error = self.__error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        """Flush and stop the thread. Later submits fail, close again does nothing."""
+        with self.__condition:
+            if self.__closed:
+                return
+        self.flush()
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        if self.__thread is not None:
+            self.__thread.join()
+            atexit.unregister(self.close)
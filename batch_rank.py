@@ -0,0 +1,109 @@
+"""Rank many item lists at once from their existing votes, asking no questions.
+
+Run as `python batch_rank.py lists/ more_lists/` to rank every list csv that has its votes csv
+next to it (backlog.csv and backlog.csv.votes.csv), e.g. one list per team or per criterion.
+Lists are ranked in parallel, one process per list and up to --jobs processes, with
+SortStrategy.Score: the best ranking the votes support, even inconsistent or incomplete ones.
+Every list gets its .out.csv, and a summary of the comparisons votes still leave unknown is
+printed and written as JSON to --output:
+
+* unknown_pairs: pairs of items whose order votes do not give, directly or transitively
+* unknown_adjacent: of them, the pairs next to each other in the ranking, the questions that
+  would settle the ranking first
+* conflicts: cycles of contradicting votes, see VotesCache.get_conflicts
+"""
+import argparse
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+import time
+
+# ranking many lists: skip runtime type checks unless asked for, see typechecking.py
+os.environ.setdefault("LIST_SORT_TYPECHECK", "0")
+
+from items import Items  # noqa: E402
+from sort_items import SortStrategy, sort_items  # noqa: E402
+from typechecking import typechecked  # noqa: E402
+from user_questions import UserVoteUiMaker  # noqa: E402
+
+_NOT_LIST_SUFFIXES = (".out.csv", ".votes.csv", ".round.csv")
+
+
+@typechecked
+def discover_lists(paths: list) -> list:
+    """List csv files in paths (files or directories) with a votes csv next to them, sorted."""
+    filenames = set()
+    for path in paths:
+        candidates = glob.glob(os.path.join(path, "*.csv")) if os.path.isdir(path) else [path]
+        for filename in candidates:
+            if filename.endswith(_NOT_LIST_SUFFIXES) or not os.path.exists(filename + ".votes.csv"):
+                continue
+            filenames.add(filename)
+    return sorted(filenames)
+
+
+@typechecked
+def rank_list(filename: str) -> dict:
+    """Write filename.out.csv from the votes of filename, returns its summary."""
+    start = time.perf_counter()
+    items = Items(filename)
+    user_vote_ui_maker = UserVoteUiMaker(filename + ".votes", items, sync_votes=False)
+    try:
+        votes = user_vote_ui_maker.get_votes()
+        sorted_list = sort_items(items, user_vote_ui_maker, filename + ".out.csv", SortStrategy.Score)
+        graph = votes.get_graph()
+        item_ids = [item.get_id() for item in sorted_list.get_items()]
+        graph.get_indexes(item_ids)
+        # every item is in its own bucket: known pairs of an item are the bits of its three bitsets but itself
+        known_pairs = sum(bin(bigger | smaller | tied).count("1") - 1
+                          for bigger, smaller, tied in map(graph.get_bitsets, item_ids)) // 2
+        return {"filename": filename,
+                "items": len(item_ids),
+                "votes": len(votes),
+                "unknown_pairs": len(item_ids) * (len(item_ids) - 1) // 2 - known_pairs,
+                "unknown_adjacent": sum(graph.compare_ids(item1_id, item2_id) is None
+                                        for item1_id, item2_id in zip(item_ids, item_ids[1:])),
+                "conflicts": len(votes.get_conflicts()),
+                "seconds": time.perf_counter() - start}
+    finally:
+        user_vote_ui_maker.close()
+
+
+def _rank_list_or_error(filename: str) -> dict:
+    try:
+        return rank_list(filename)
+    except Exception as error:
+        logging.exception(f"ranking {filename} failed")
+        return {"filename": filename, "error": f"{type(error).__name__}: {error}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=["."], help="list csv files or directories holding them")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="parallel processes")
+    parser.add_argument("--output", default="batch_rank.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    filenames = discover_lists(args.paths)
+    if not filenames:
+        parser.error(f"no list csv with its votes csv in {' '.join(args.paths)}")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        results = list(executor.map(_rank_list_or_error, filenames))
+    print(f"{'list':40} {'items':>6} {'votes':>7} {'unknown':>9} {'adjacent':>8} {'conflicts':>9}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['filename']:40} {result['error']}")
+            continue
+        print(f"{result['filename']:40} {result['items']:6} {result['votes']:7} {result['unknown_pairs']:9} "
+              f"{result['unknown_adjacent']:8} {result['conflicts']:9}")
+    with open(args.output, mode='w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2)
+    if any("error" in result for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Benchmark of every SortStrategy against a simulated voter.
+
+The voter knows a hidden ground truth order of synthetic items and answers each question
+according to it, except for a configurable fraction of answers picked at random (noise). Every
+(strategy, size) case runs in its own subprocess, in a fresh directory, with --prior-votes answers
+to random pairs already recorded (votes of a previous session, not counted as questions), and
+reports:
+
+* questions: answers asked to the voter
+* cached_hit_ratio: comparisons answered from direct or inferred votes instead of the voter
+* seconds_per_item: wall time of the whole sort divided by the number of items
+* peak_memory_kib: peak resident memory of the subprocess
+* kendall_tau: rank correlation of the result with the hidden order (1 is a perfect sort)
+
+Results are printed as a table and written as a JSON list to --output, so runs can be compared
+to catch regressions in question count or cpu time. Sizes from 50 to 50,000 items are supported
+(--sizes 50,500,5000,50000), large sizes of the strategies writing the output after every
+insertion take a long time.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def write_synthetic_items_csv(filename: str, count: int):
+    with open(filename, mode='w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(("Const", "Title", "URL", "Year"))
+        for item_id in range(1, count + 1):
+            writer.writerow((item_id, f"title {item_id}", f"https://example.com/{item_id}", "2000"))
+
+
+def kendall_tau(ranks: list) -> float:
+    """Kendall tau-a between ranks (hidden rank of each result position) and 0..n-1, O(n log n)."""
+    count = len(ranks)
+    if count < 2:
+        return 1.0
+    inversions = 0
+    values = list(ranks)
+    width = 1
+    while width < count:
+        merged = []
+        for start in range(0, count, 2 * width):
+            left = values[start:start + width]
+            right = values[start + width:start + 2 * width]
+            i = j = 0
+            while i < len(left) and j < len(right):
+                if right[j] < left[i]:
+                    inversions += len(left) - i
+                    merged.append(right[j])
+                    j += 1
+                else:
+                    merged.append(left[i])
+                    i += 1
+            merged.extend(left[i:])
+            merged.extend(right[j:])
+        values = merged
+        width *= 2
+    pairs = count * (count - 1) // 2
+    return 1.0 - 2.0 * inversions / pairs
+
+
+def _run_case(strategy_name: str, size: int, noise: float, seed: int, prior_votes: int = 0) -> dict:
+    from items import Items
+    from sort_items import SortStrategy, sort_items
+    from user_questions import UserVoteUiMaker
+    from voters import CallbackVoter
+
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        items_filename = os.path.join(directory, "items.csv")
+        write_synthetic_items_csv(items_filename, size)
+        hidden_order = list(range(1, size + 1))
+        random.shuffle(hidden_order)
+        hidden_rank = {item_id: rank for rank, item_id in enumerate(hidden_order)}
+
+        def simulated_question(item1, item2):
+            if random.random() < noise:
+                return random.choice((item1, item2))
+            return item1 if hidden_rank[item1.get_id()] > hidden_rank[item2.get_id()] else item2
+
+        start = time.perf_counter()
+        items = Items(items_filename)
+        user_vote_ui_maker = UserVoteUiMaker(items_filename + ".votes", items, CallbackVoter(simulated_question),
+                                             sync_votes=False)
+        wrapped_items = items.get_wrapped_items()
+        for _ in range(prior_votes):
+            item1, item2 = random.sample(wrapped_items, 2)
+            if user_vote_ui_maker.get_votes().get(item1, item2) is None:
+                user_vote_ui_maker.record_vote(item1, item2, simulated_question(item1, item2))
+        try:
+            result = sort_items(items, user_vote_ui_maker, items_filename + ".out.csv", SortStrategy[strategy_name])
+        finally:
+            user_vote_ui_maker.close()
+        elapsed = time.perf_counter() - start
+
+    sorted_items = result if isinstance(result, list) else result.get_items()
+    if strategy_name == SortStrategy.Random.name:
+        # sorted descending
+        sorted_items = sorted_items[::-1]
+    comparisons = user_vote_ui_maker.get_comparison_count()
+    questions = user_vote_ui_maker.get_question_count()
+    return {
+        "strategy": strategy_name,
+        "size": size,
+        "noise": noise,
+        "seed": seed,
+        "prior_votes": prior_votes,
+        "questions": questions,
+        "comparisons": comparisons,
+        "cached_hit_ratio": 1.0 - questions / comparisons if comparisons else 1.0,
+        "seconds": elapsed,
+        "seconds_per_item": elapsed / size,
+        "peak_memory_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "kendall_tau": kendall_tau([hidden_rank[item.get_id()] for item in sorted_items]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50,500,5000", help="comma separated item counts")
+    parser.add_argument("--strategies", default=None, help="comma separated SortStrategy names, all by default")
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of random answers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prior-votes", type=int, default=0, help="random pairs answered before the sort")
+    parser.add_argument("--output", default="benchmark_strategies.json")
+    parser.add_argument("--run-case", nargs=2, metavar=("STRATEGY", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(_run_case(args.run_case[0], int(args.run_case[1]), args.noise, args.seed,
+                                   args.prior_votes)))
+        return
+
+    from sort_items import SortStrategy
+    strategies = args.strategies.split(",") if args.strategies else [strategy.name for strategy in SortStrategy]
+    results = []
+    print(f"{'strategy':36} {'size':>6} {'questions':>9} {'cached':>7} {'ms/item':>9} {'peak MiB':>8} {'tau':>6}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        for strategy_name in strategies:
+            output = subprocess.run([sys.executable, __file__, "--run-case", strategy_name, str(size),
+                                     "--noise", str(args.noise), "--seed", str(args.seed),
+                                     "--prior-votes", str(args.prior_votes)],
+                                    check=True, capture_output=True, text=True,
+                                    env=dict(os.environ, LIST_SORT_TYPECHECK=os.environ.get("LIST_SORT_TYPECHECK", "0")))
+            result = json.loads(output.stdout.splitlines()[-1])
+            results.append(result)
+            print(f"{strategy_name:36} {size:6} {result['questions']:9} {result['cached_hit_ratio']:7.2f} "
+                  f"{result['seconds_per_item'] * 1000:9.2f} {result['peak_memory_kib'] / 1024:8.1f} "
+                  f"{result['kendall_tau']:6.3f}")
+    with open(args.output, mode='w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
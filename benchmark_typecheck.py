@@ -0,0 +1,78 @@
+"""Throughput of the engine hot paths with and without runtime type checking.
+
+Run as `python benchmark_typecheck.py`: it runs itself once per mode in a subprocess (the mode is
+chosen at import time, see typechecking.py) and prints operations per second for the
+comparator on cached votes, vote key hashing and vote replay from csv.
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_strategies import write_synthetic_items_csv
+
+ITEM_COUNT = 1000
+VOTE_COUNT = 10000
+
+
+def _rate(operations, function):
+    start = time.perf_counter()
+    function()
+    return operations / (time.perf_counter() - start)
+
+
+def _run_mode():
+    from items import Items
+    from user_questions import UserVoteUiMaker
+    from votes import VotesCache
+
+    with tempfile.TemporaryDirectory() as directory:
+        items_filename = os.path.join(directory, "items.csv")
+        write_synthetic_items_csv(items_filename, ITEM_COUNT)
+        items = Items(items_filename)
+        wrapped = items.get_wrapped_items()
+        random.seed(0)
+        pairs = set()
+        while len(pairs) < VOTE_COUNT:
+            pair = tuple(sorted(random.sample(range(ITEM_COUNT), 2)))
+            pairs.add(pair)
+        pairs = [(wrapped[i], wrapped[j]) for i, j in pairs]
+
+        votes = VotesCache(items)
+        for bigger, smaller in pairs:
+            votes.add(bigger, smaller, bigger)
+        votes_filename = os.path.join(directory, "items.csv.votes.csv")
+        votes.save_to_csv_file(votes_filename)
+
+        results = {
+            "vote replay (votes/s)": _rate(VOTE_COUNT, lambda: VotesCache(items).load_from_csv(votes_filename)),
+            "key hashing (lookups/s)": _rate(VOTE_COUNT, lambda: [votes.get(x, y) for x, y in pairs]),
+        }
+        user_vote_ui_maker = UserVoteUiMaker(os.path.join(directory, "items.csv.votes"), items)
+        results["comparator (cached cmp/s)"] = _rate(VOTE_COUNT, lambda: [
+            user_vote_ui_maker.cmp_query_cache_or_ask_user_implementation(x, y) for x, y in pairs])
+        user_vote_ui_maker.close()
+    for name, rate in results.items():
+        print(f"{name}\t{rate:.0f}")
+
+
+def main():
+    rates = {}
+    for mode in ("1", "0"):
+        output = subprocess.run([sys.executable, __file__, "--run-mode"], check=True, capture_output=True, text=True,
+                                env=dict(os.environ, LIST_SORT_TYPECHECK=mode)).stdout
+        for line in output.splitlines():
+            name, rate = line.split("\t")
+            rates.setdefault(name, {})[mode] = float(rate)
+    print(f"{'':30} {'checked':>12} {'unchecked':>12} {'speedup':>8}")
+    for name, by_mode in rates.items():
+        print(f"{name:30} {by_mode['1']:12.0f} {by_mode['0']:12.0f} {by_mode['0'] / by_mode['1']:7.1f}x")
+
+
+if __name__ == '__main__':
+    if "--run-mode" in sys.argv:
+        _run_mode()
+    else:
+        main()
@@ -0,0 +1,92 @@
+"""Memory and lookup speed of the vote stores (vote_stores.py) on a large vote set.
+
+Run as `python benchmark_vote_store.py [vote count]` (1,000,000 votes by default): every store
+is filled with the same random votes in its own subprocess, without runtime type checking, and
+the memory it retains is measured with tracemalloc. The votes are then written as a votes csv and
+its snapshot (write_vote_snapshot, with the vote graph), and the time a UserVoteUiMaker takes to
+open them and answer a first comparison the votes only imply transitively is measured.
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmark_strategies import write_synthetic_items_csv
+
+ITEM_COUNT = 5000
+LOOKUP_COUNT = 100000
+STORE_NAMES = ("DictVoteStore", "ArrayVoteStore")
+
+
+def _run_store(store_name: str, vote_count: int):
+    import vote_stores
+    from items import Items
+    from user_questions import UserVoteUiMaker
+    from vote import ItemPairVote
+    from votes import VotesCache
+
+    with tempfile.TemporaryDirectory() as directory:
+        items_filename = os.path.join(directory, "items.csv")
+        write_synthetic_items_csv(items_filename, ITEM_COUNT)
+        items = Items(items_filename)
+        wrapped = items.get_wrapped_items()
+    random.seed(0)
+    pair_set = set()
+    while len(pair_set) < vote_count:
+        pair_set.add(tuple(sorted(random.sample(range(ITEM_COUNT), 2))))
+    pairs = list(pair_set)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = getattr(vote_stores, store_name)()
+    for i, j in pairs:
+        # consistent votes: the lower index is bigger, items of the same ten are tied
+        store.add(ItemPairVote(wrapped[i], wrapped[j], None if i // 10 == j // 10 else wrapped[i], 0.0))
+    add_seconds = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    lookups = [(wrapped[i].get_id(), wrapped[j].get_id()) for i, j in random.sample(pairs, LOOKUP_COUNT)]
+    start = time.perf_counter()
+    for item1_id, item2_id in lookups:
+        store.get(item1_id, item2_id)
+    get_seconds = time.perf_counter() - start
+
+    first_pair = next(pair for pair in zip(range(ITEM_COUNT // 2), range(ITEM_COUNT - 1, 0, -1))
+                      if pair not in pair_set)
+    with tempfile.TemporaryDirectory() as directory:
+        votes_filename = os.path.join(directory, "items.csv.votes")
+        votes = VotesCache(items, store)
+        votes.save_to_csv_file(votes_filename + ".csv")
+        votes.get_graph()
+        vote_stores.write_vote_snapshot(votes_filename + ".snapshot", store, votes_filename + ".csv",
+                                        votes.get_graph_state())
+        start = time.perf_counter()
+        user_vote_ui_maker = UserVoteUiMaker(votes_filename, items, sync_votes=False)
+        user_vote_ui_maker.get_known_cmp(wrapped[first_pair[0]], wrapped[first_pair[1]])
+        open_seconds = time.perf_counter() - start
+        user_vote_ui_maker.close()
+    print(f"{memory}\t{vote_count / add_seconds:.0f}\t{LOOKUP_COUNT / get_seconds:.0f}\t{open_seconds}")
+
+
+def main():
+    vote_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{vote_count} votes among {ITEM_COUNT} items")
+    print(f"{'':16} {'MiB':>8} {'bytes/vote':>10} {'adds/s':>10} {'gets/s':>10} {'open+compare ms':>16}")
+    for store_name in STORE_NAMES:
+        output = subprocess.run([sys.executable, __file__, "--run-store", store_name, str(vote_count)],
+                                check=True, capture_output=True, text=True,
+                                env=dict(os.environ, LIST_SORT_TYPECHECK="0")).stdout
+        memory, add_rate, get_rate, open_seconds = output.split()
+        print(f"{store_name:16} {int(memory) / 2 ** 20:8.1f} {int(memory) / vote_count:10.1f} "
+              f"{float(add_rate):10.0f} {float(get_rate):10.0f} {float(open_seconds) * 1000:16.1f}")
+
+
+if __name__ == '__main__':
+    if "--run-store" in sys.argv:
+        _run_store(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
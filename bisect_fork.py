@@ -46,6 +46,48 @@ def bisect_right_1(a, x, lo=0, hi=None, *, key=None, mid_func=None):
     return lo
 
 
+def insort_right_cmp(a, x, cmp, lo=0, hi=None, *, mid_func=None):
+    """Insert item x in list a, and keep it sorted assuming a is sorted.
+
+    Same as insort_right_1 but using a three way comparison function, see bisect_right_cmp.
+    Returns the index where x was inserted.
+    """
+    lo = bisect_right_cmp(a, x, cmp, lo, hi, mid_func=mid_func)
+    a.insert(lo, x)
+    return lo
+
+
+def bisect_right_cmp(a, x, cmp, lo=0, hi=None, *, mid_func=None):
+    """Return the index where to insert item x in list a, assuming a is sorted.
+
+    cmp(x, e) returns a negative number if x < e, a positive one if x > e and zero if x and e
+    are tied. Tied items form a bucket of adjacent elements: when x is tied with some e the
+    search stops and the returned index is just after e, so x joins its bucket.
+
+    Optional args lo (default 0) and hi (default len(a)) bound the
+    slice of a to be searched.
+    """
+
+    if lo < 0:
+        raise ValueError('lo must be non-negative')
+    if hi is None:
+        hi = len(a)
+    while lo < hi:
+        if mid_func is None:
+            mid = (lo + hi) // 2
+        else:
+            mid = mid_func(a, lo, hi)
+        result = cmp(x, a[mid])
+        if result == 0:
+            return mid + 1
+        if result < 0:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    return lo
+
+
 def insort_left(a, x, lo=0, hi=None, *, key=None):
     """Insert item x in list a, and keep it sorted assuming a is sorted.
 
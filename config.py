@@ -1 +0,0 @@
-fail_on_vote_undecide = False
@@ -0,0 +1,25 @@
+import csv
+
+import pytest
+
+from items import Items
+
+
+@pytest.fixture
+def items_filename(tmp_path):
+    return str(tmp_path / "items.csv")
+
+
+@pytest.fixture
+def make_items(items_filename):
+    """make_items(count): Items with ids 1 to count, from a csv at items_filename."""
+
+    def make(count: int) -> Items:
+        with open(items_filename, mode='w', encoding='utf-8', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(("Const", "Title", "URL", "Year"))
+            for item_id in range(1, count + 1):
+                writer.writerow((item_id, f"title {item_id}", f"https://example.com/{item_id}", "2000"))
+        return Items(items_filename)
+
+    return make
@@ -1,43 +1,39 @@
 import csv
-import random
+import io
+import os
 from typing import Iterable
 
 import chardet
-import typeguard
 
+from typechecking import typechecked
 
-@typeguard.typechecked
-def guess_file_encoding(filename: str):
-    # testing autodetection; before: encoding='utf-8'
-    with open(filename, 'rb') as rawdata:
-        result = chardet.detect(rawdata.read(10000))
-
-    encoding = result["encoding"]
 
-    return encoding
+ENCODING_SAMPLE_BYTES = 10000
 
 
-@typeguard.typechecked
-def _read_csv(filename: str):
-    with open(filename, mode='r', encoding=guess_file_encoding(filename)) as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-        for row in csv_reader:
-            yield row
+@typechecked
+def _guess_encoding(sample: bytes):
+    # testing autodetection; before: encoding='utf-8'
+    return chardet.detect(sample)["encoding"]
 
 
-@typeguard.typechecked
-def read_csv_random(filename: str):
-    csv_items = list(_read_csv(filename))
-    if csv_items is None:
-        raise Exception()
-    random.shuffle(csv_items)
-    for randomized_item in csv_items:
-        yield randomized_item
+@typechecked
+def _read_csv(filename: str):
+    """Stream rows as dicts, opening the file once: its encoding is guessed from the first bytes read."""
+    with open(filename, mode='rb') as raw_file:
+        encoding = _guess_encoding(raw_file.read(ENCODING_SAMPLE_BYTES))
+        raw_file.seek(0)
+        with io.TextIOWrapper(raw_file, encoding=encoding, newline='') as csv_file:
+            csv_reader = csv.DictReader(csv_file)
+            for row in csv_reader:
+                yield row
 
 
-@typeguard.typechecked
+@typechecked
 def write_csv_1(filename: str, column_names: Iterable[str], items: list[dict]):
-    with open(filename, mode='w', encoding='utf-8', newline='') as csv_file:
+    """Write through a temp file renamed over filename, so readers never see a half written csv."""
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, mode='w', encoding='utf-8', newline='') as csv_file:
         writer = csv.DictWriter(csv_file, fieldnames=column_names)
         writer.writeheader()
         for row in items:
@@ -45,4 +41,5 @@ def write_csv_1(filename: str, column_names: Iterable[str], items: list[dict]):
             try:
                 writer.writerow(row)
             except:
-                raise
\ No newline at end of file
+                raise
+    os.replace(temp_filename, filename)
@@ -0,0 +1,117 @@
+from typing import Callable, Optional
+
+import numpy as np
+
+from item import ItemWrapper
+from typechecking import typechecked
+from votes import VotesCache
+
+
+def _bitset_to_array(bitset: int, size: int) -> np.ndarray:
+    raw = np.frombuffer(bitset.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:size].astype(bool)
+
+
+def _get_log_position_weights(a: list, x: ItemWrapper, votes: VotesCache, list_indexes: np.ndarray) -> np.ndarray:
+    """Log likelihood of every position of x in a given the votes of x against items not in a.
+
+    Such an item can still be anywhere between the elements of a known to be below and above it,
+    each gap equally likely: x > item at position p has the probability that the item is before
+    p, or in the same gap and ordered below x (half). Comparisons against elements of a are left
+    to the candidates, where they are certain.
+    """
+    graph = votes.get_graph()
+    in_list = set(element.get_id() for element in a)
+    positions = np.arange(len(a) + 1)
+    log_weights = np.zeros(len(a) + 1)
+    for vote in votes.get_item_votes(x):
+        other = vote.get_item_2() if vote.get_item_1().get_id() == x.get_id() else vote.get_item_1()
+        if vote.is_uncertain() or other.get_id() in in_list:
+            continue
+        other_bigger, other_smaller, _ = graph.get_bitsets(other.get_id())
+        below_other = np.flatnonzero(_bitset_to_array(other_smaller, len(graph))[list_indexes])
+        above_other = np.flatnonzero(_bitset_to_array(other_bigger, len(graph))[list_indexes])
+        lowest = int(below_other[-1]) + 1 if len(below_other) else 0
+        highest = int(above_other[0]) if len(above_other) else len(a)
+        if highest < lowest:
+            # conflicting votes
+            continue
+        gaps = highest - lowest + 1
+        same_gap = (positions >= lowest) & (positions <= highest)
+        x_bigger = (np.clip(positions - lowest, 0, gaps) + 0.5 * same_gap) / gaps
+        if vote.get_bigger().get_id() != x.get_id():
+            x_bigger = 1.0 - x_bigger
+        # floor: a conflicting vote must not rule a position out
+        log_weights += np.log(np.maximum(x_bigger, 0.01))
+    return log_weights
+
+
+@typechecked
+def insort_most_informative(a: list, x: ItemWrapper, cmp, votes: VotesCache,
+                            known_cmp: Optional[Callable] = None) -> int:
+    """Insert x in sorted list a asking the comparisons that narrow its position the most.
+
+    Position p means inserting before a[p]. Known (cached or inferred) comparisons of x against
+    every element of a rule out positions: the candidates are the positions contradicting the
+    fewest known comparisons. Votes of x against items not inserted yet weight the candidates (a
+    win against an item that can be anywhere in a makes the upper positions likelier). Each
+    question is the element splitting the weight of the candidates closest to halves, the answer
+    with the largest expected entropy reduction over the position of x. Without such votes the
+    candidates weigh the same and this is a binary search of them. Returns the index where x was
+    inserted.
+
+    The known comparisons are read from the vote graph at once, not through cmp. known_cmp, if
+    given, is called for the ones a binary search would read from known votes before its first
+    question, so that they count as cached comparisons like in the other strategies.
+    """
+    if known_cmp is not None:
+        lo, hi = 0, len(a)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if not votes.has_certain_vote(x, a[mid]):
+                break
+            if known_cmp(x, a[mid]) < 0:
+                hi = mid
+            else:
+                lo = mid + 1
+    graph = votes.get_graph()
+    list_indexes = np.array(graph.get_indexes([element.get_id() for element in a]), dtype=np.int64)
+    log_weights = _get_log_position_weights(a, x, votes, list_indexes)
+    asked = {}  # type: dict[int, int]
+    while True:
+        bigger_bitset, smaller_bitset, tied_bitset = graph.get_bitsets(x.get_id())
+        size = len(graph)
+        above = _bitset_to_array(bigger_bitset, size)[list_indexes]
+        below = _bitset_to_array(smaller_bitset, size)[list_indexes]
+        tied = _bitset_to_array(tied_bitset, size)[list_indexes]
+        for position, result in asked.items():
+            above[position] = result < 0
+            below[position] = result > 0
+            tied[position] = result == 0
+        if tied.any():
+            # join the bucket of tied items
+            index = int(np.flatnonzero(tied)[-1]) + 1
+            break
+        zero = np.zeros(1, dtype=np.int64)
+        above_before = np.concatenate((zero, np.cumsum(above)))
+        below_before = np.concatenate((zero, np.cumsum(below)))
+        violations = above_before + (below_before[-1] - below_before)
+        candidates = violations == violations.min()
+        candidates_count = int(candidates.sum())
+        if candidates_count == 1:
+            index = int(np.flatnonzero(candidates)[0])
+            break
+        # asking about a[j]: x < a[j] keeps positions <= j, x > a[j] keeps positions > j
+        left = np.cumsum(candidates)[:-1]
+        unknown = ~(above | below) & (left > 0) & (left < candidates_count)
+        if not unknown.any():
+            # remaining candidates only differ in conflicting votes
+            index = int(np.flatnonzero(candidates)[-1])
+            break
+        weights = np.where(candidates, np.exp(log_weights - log_weights[candidates].max()), 0.0)
+        # the entropy of the answer is largest for the split closest to halves
+        left_fraction = np.cumsum(weights)[:-1] / weights.sum()
+        position = int(np.argmin(np.where(unknown, np.abs(left_fraction - 0.5), np.inf)))
+        asked[position] = cmp(x, a[position])
+    a.insert(index, x)
+    return index
@@ -1,6 +1,5 @@
-import typeguard
-
 from common_utils import common_repr
+from typechecking import typechecked
 
 
 class MainFields:
@@ -14,11 +13,12 @@ class MainFields:
 cmp_imp = None
 
 
-@typeguard.typechecked
+@typechecked
 class ItemWrapper:
     def __init__(self, item_data: dict, id_field: str):
         self.__data = item_data
         self.__id_field_name = id_field
+        self.__id = int(self.__data.get(self.__id_field_name))
 
     def format_description(self):
         # TODO: guess description
@@ -38,7 +38,7 @@ class ItemWrapper:
         return cmp_imp(self, other)
 
     def get_id(self):
-        return int(self.__data.get(self.__id_field_name))
+        return self.__id
 
     def get_main_fields(self) -> MainFields:
         return MainFields(self.get_id(), self.format_description())
@@ -47,9 +47,7 @@ class ItemWrapper:
         return common_repr(self, f"{self.format_short()}")
 
     def match_id(self, item_id):
-        if self.get_id() == item_id:
-            return True
-        return False
+        return self.__id == item_id
 
     def get_data(self):
         return self.__data
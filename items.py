@@ -1,14 +1,19 @@
+import itertools
 import logging
 import os
 import random
-
-import typeguard
+from typing import Optional
 
 from item import ItemWrapper
-from list_sort_from_user_item_pair_votes.csv_helper import _read_csv, write_csv_1
+from background_writer import BackgroundWriter
+from csv_helper import _read_csv, write_csv_1
+from metrics import METRICS
+from typechecking import typechecked
+
+ID_FIELD_SAMPLE_ROWS = 1000
 
 
-@typeguard.typechecked
+@typechecked
 def _guess_id_field(rows: list[dict]):
     assert isinstance(rows, list)
     first_row = rows[0]
@@ -28,58 +33,118 @@ def _guess_id_field(rows: list[dict]):
     return keys[0]
 
 
-@typeguard.typechecked
+@typechecked
 class Items:
+    """Items of a csv, one ItemWrapper per row.
+
+    Wrappers are built on first access: find_item_by_id builds only the one asked for, so the vote
+    stores that resolve ids (MappedVoteStore, SqliteVoteStore) only wrap the items they read, while
+    get_wrapped_items builds the rest, the list it returns being the one sorted lists grow in place.
+    """
 
     def __init__(self, filename: str, load_csv: bool = True):
         self.__filename = filename
+        self.__rows = []  # type: list[dict]
+        self.__id_field = None  # type: Optional[str]
         if load_csv and os.path.exists(filename):
-            rows = list(_read_csv(filename))
-            self.__wrapped_items = list(map(lambda x: ItemWrapper(x, _guess_id_field(rows)), rows))
-        else:
-            self.__wrapped_items = []
+            rows = _read_csv(filename)
+            # id field guessed once from the first rows, then the rest streamed
+            sample = list(itertools.islice(rows, ID_FIELD_SAMPLE_ROWS))
+            self.__id_field = _guess_id_field(sample) if sample else None
+            self.__rows = list(itertools.chain(sample, rows))
+        self.__position_by_id = {int(row[self.__id_field]): position for position, row in enumerate(self.__rows)}
+        if len(self.__position_by_id) != len(self.__rows):
+            raise ValueError(f"{filename}: repeated values in id field {self.__id_field}")
+        # None until built, see __get_wrapper
+        self.__wrapped_items = [None] * len(self.__rows)  # type: list[Optional[ItemWrapper]]
+        self.__all_wrapped = not self.__rows
+        self.__items_by_id = {}  # type: dict[int, ItemWrapper]
+
+    def __get_wrapper(self, position: int) -> ItemWrapper:
+        wrapped_item = self.__wrapped_items[position]
+        if wrapped_item is None:
+            wrapped_item = ItemWrapper(self.__rows[position], self.__id_field)
+            self.__wrapped_items[position] = wrapped_item
+        return wrapped_item
+
+    def __build_id_index(self):
+        self.__items_by_id = {wrapped_item.get_id(): wrapped_item for wrapped_item in self.__wrapped_items}
+
+    def get_ids(self) -> list:
+        """Item ids in csv order, without building the wrappers."""
+        if self.__all_wrapped:
+            return [wrapped_item.get_id() for wrapped_item in self.__wrapped_items]
+        return list(self.__position_by_id)
 
     def get_wrapped_items_randomized(self):
-        random_wrapped_items = self.__wrapped_items[:]
+        random_wrapped_items = self.get_wrapped_items()[:]
         random.shuffle(random_wrapped_items)
         return random_wrapped_items
 
     def get_wrapped_items(self):
+        if not self.__all_wrapped:
+            for position in range(len(self.__wrapped_items)):
+                self.__get_wrapper(position)
+            self.__all_wrapped = True
+            self.__build_id_index()
         return self.__wrapped_items
 
     def get_item_by_id(self, item_id: int):
-        for wrapped_item in self.__wrapped_items:
-            if wrapped_item.get_id() == item_id:
-                return wrapped_item
-        raise NotImplementedError()
+        wrapped_item = self.find_item_by_id(item_id)
+        if wrapped_item is None:
+            raise NotImplementedError()
+        return wrapped_item
+
+    def find_item_by_id(self, item_id: int) -> Optional[ItemWrapper]:
+        """Item with that id, None if there is none (e.g. removed from the csv)."""
+        if not self.__all_wrapped:
+            position = self.__position_by_id.get(item_id)
+            return None if position is None else self.__get_wrapper(position)
+        if len(self.__items_by_id) != len(self.__wrapped_items):
+            # list was modified in place through get_items()
+            self.__build_id_index()
+        return self.__items_by_id.get(item_id)
 
     def format(self):
-        items_formatted = map(lambda x: x.format_short(), self.__wrapped_items)
+        items_formatted = map(lambda x: x.format_short(), self.get_wrapped_items())
         return '\n'.join(items_formatted)
 
     def print(self):
+        if not logging.root.isEnabledFor(logging.DEBUG):
+            return
         logging.debug("{} begin {} elements".format(self.__class__.__name__, len(self.__wrapped_items)))
         logging.debug(self.format())
         logging.debug("{} end {} elements".format(self.__class__.__name__, len(self.__wrapped_items)))
 
     def __repr__(self):
-        return "size={} {}".format(len(self.__wrapped_items), repr(self.__wrapped_items))
+        return "size={} {}".format(len(self.__wrapped_items), repr(self.get_wrapped_items()))
 
     def __len__(self):
         return len(self.__wrapped_items)
 
     def get_field_names(self):
-        first = self.__wrapped_items[0]
+        first = self.get_wrapped_items()[0]
         assert isinstance(first, ItemWrapper)
         data = first.get_data()
         return data.keys()
 
-    def write_csv(self):
+    def write_csv(self, writer: Optional[BackgroundWriter] = None):
+        """Written by writer in the background if given, from a copy of the rows taken now."""
         def temp(row):
             assert isinstance(row, ItemWrapper)
-            return row.get_data()
+            return dict(row.get_data())
 
-        write_csv_1(self.__filename, self.get_field_names(), [temp(row) for row in self.__wrapped_items])
+        field_names = list(self.get_field_names())
+        rows = [temp(row) for row in self.get_wrapped_items()]
+
+        def write():
+            with METRICS.timer("write_csv"):
+                write_csv_1(self.__filename, field_names, rows)
+
+        if writer is None:
+            write()
+        else:
+            writer.submit(self.__filename, write)
 
     def get_items(self):
         return self.get_wrapped_items()
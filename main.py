@@ -5,13 +5,21 @@
 
 
 import logging
+import os
+import signal
+import sys
 
-from sort_items import SortStrategy
-from sort_items import sort_items_from_csv_loop
+# interactive runs skip runtime type checks unless asked for, see typechecking.py
+os.environ.setdefault("LIST_SORT_TYPECHECK", "0")
+
+from sort_items import SortStrategy  # noqa: E402
+from sort_items import sort_items_from_csv  # noqa: E402
 
 if __name__ == '__main__':
     logging.basicConfig(format="%(module)s:%(filename)s:%(funcName)s:%(message)s", level=logging.DEBUG)
     logging.debug('logger configured')
+    # exit normally on kill, so the votes and outputs still queued for writing are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
     filename = 'items.csv'
     strategy = SortStrategy.PrioritizeCertaintyCertainMidFirst
-    sortedDict = sort_items_from_csv_loop(filename, strategy)
+    sortedDict = sort_items_from_csv(filename, strategy, metrics_filename=filename + ".metrics.json")
@@ -0,0 +1,68 @@
+from typechecking import typechecked
+
+
+def _insertion_order(count: int) -> list:
+    """1-based indexes of the pending elements b2..b<count> in Ford-Johnson insertion order.
+
+    Groups end at the Jacobsthal numbers 3, 5, 11, 21, 43... and each group is inserted from its
+    highest index down, so every binary search runs over at most 2^k - 1 elements.
+    """
+    order = []
+    last = 1
+    k = 2
+    while last < count:
+        top = min((2 ** (k + 1) + (-1) ** k) // 3, count)
+        order.extend(range(top, last, -1))
+        last = top
+        k += 1
+    return order
+
+
+def _binary_insert(chain: list, element, hi: int, less):
+    lo = 0
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if less(element, chain[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    chain.insert(lo, element)
+
+
+def _merge_insertion(elements: list, less) -> list:
+    if len(elements) < 2:
+        return elements[:]
+    larger_elements = []
+    smaller_by_larger = {}
+    for i in range(0, len(elements) - 1, 2):
+        first, second = elements[i], elements[i + 1]
+        if less(second, first):
+            first, second = second, first
+        larger_elements.append(second)
+        smaller_by_larger[id(second)] = first
+    straggler = elements[-1] if len(elements) % 2 else None
+
+    # sort the larger element of each pair, their partners are known to go before them
+    larger_sorted = _merge_insertion(larger_elements, less)
+    chain = [smaller_by_larger[id(larger_sorted[0])]] + larger_sorted
+    # pending[k - 2] is b<k>, to be inserted before its larger partner a<k> = larger_sorted[k - 1]
+    pending = [(smaller_by_larger[id(larger)], larger) for larger in larger_sorted[1:]]
+    if straggler is not None:
+        pending.append((straggler, None))
+
+    for k in _insertion_order(len(pending) + 1):
+        element, larger = pending[k - 2]
+        hi = len(chain) if larger is None else chain.index(larger)
+        _binary_insert(chain, element, hi, less)
+    return chain
+
+
+@typechecked
+def merge_insertion_sort(elements: list, cmp) -> list:
+    """Sort ascending with Ford-Johnson merge-insertion, close to the minimum number of comparisons.
+
+    cmp(x, y) is a three way comparison; tied elements are kept in any adjacent order. Given the
+    same input order and the same answers the same comparisons are made, so a run replayed from
+    cached votes asks nothing new.
+    """
+    return _merge_insertion(list(elements), lambda x, y: cmp(x, y) < 0)
@@ -0,0 +1,83 @@
+import contextlib
+import json
+import threading
+import time
+
+from typechecking import typechecked
+
+
+@typechecked
+class Metrics:
+    """Counters and timers of a session, written as JSON or Prometheus text by write.
+
+    Timers keep the count, total and maximum seconds of the timed blocks. Updates may come from the
+    background writer thread.
+    """
+
+    def __init__(self):
+        self.__counters = {}  # type: dict[str, int]
+        self.__timers = {}  # type: dict[str, list]
+        self.__lock = threading.Lock()
+
+    def reset(self):
+        with self.__lock:
+            self.__counters.clear()
+            self.__timers.clear()
+
+    def increment(self, name: str, amount: int = 1):
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float):
+        with self.__lock:
+            timer = self.__timers.get(name)
+            if timer is None:
+                self.__timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def get_counter(self, name: str) -> int:
+        return self.__counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self.__lock:
+            return {"counters": dict(self.__counters),
+                    "timers": {name: {"count": count, "seconds": total, "max_seconds": maximum}
+                               for name, (count, total, maximum) in self.__timers.items()}}
+
+    def format_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE list_sort_{name}_total counter")
+            lines.append(f"list_sort_{name}_total {value}")
+        for name, timer in sorted(snapshot["timers"].items()):
+            count, total, maximum = timer["count"], timer["seconds"], timer["max_seconds"]
+            lines.append(f"# TYPE list_sort_{name}_seconds summary")
+            lines.append(f"list_sort_{name}_seconds_count {count}")
+            lines.append(f"list_sort_{name}_seconds_sum {total}")
+            lines.append(f"# TYPE list_sort_{name}_max_seconds gauge")
+            lines.append(f"list_sort_{name}_max_seconds {maximum}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename: str):
+        """Prometheus text format if filename ends with .prom, JSON otherwise."""
+        with open(filename, mode='w', encoding='utf-8') as metrics_file:
+            if filename.endswith(".prom"):
+                metrics_file.write(self.format_prometheus())
+            else:
+                json.dump(self.snapshot(), metrics_file, indent=2)
+
+
+# process wide, like the logging module: sort_items_from_csv resets it at the start of every run
+METRICS = Metrics()
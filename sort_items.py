@@ -1,31 +1,121 @@
-import bisect
 import enum
 import functools
 import logging
-
-import typeguard
+import os
+from typing import Callable, Optional
 
 import bisect_fork
 import item as item_package
+from background_writer import BackgroundWriter
 from item import ItemWrapper
+from information_gain import insort_most_informative
 from items import Items
-from user_questions import UserVoteUiMaker, VoteUndecidedException
+from merge_insertion import merge_insertion_sort
+from metrics import METRICS
+from scoring import enrich_items_with_scores, sort_items_by_score, sort_items_by_votes
+from top_k import DEFAULT_TOP_K, top_k_insertion
+from tournament_rounds import round_insertion_sort
+from typechecking import typechecked
+from user_questions import UserVoteUiMaker
+from vote_consistency import SortedListVoteChecker
+from voters import Voter
+from votes import VotesCache
 
 
-@typeguard.typechecked
+@typechecked
 class SortStrategy(enum.Enum):
     Random = enum.auto()
     PrioritizeCertainty = enum.auto()
     PrioritizeCertaintyCertainMidFirst = enum.auto()
+    PrioritizeCertaintyInformationGain = enum.auto()
+    MergeInsertion = enum.auto()
+    Score = enum.auto()
+    TournamentRounds = enum.auto()
+    TopK = enum.auto()
+
+
+@typechecked
+def enrich_and_write_csv(sorted_list: Items, votes: VotesCache, writer: Optional[BackgroundWriter] = None):
+    """Add the vote stats and scores columns to sorted_list and write it, by writer if given."""
+    votes.enrich_items_with_stats(sorted_list)
+    enrich_items_with_scores(sorted_list, votes)
+    sorted_list.write_csv(writer)
+    for cycle in votes.get_conflicts():
+        logging.warning("conflicting votes: {}".format(", ".join(vote.format() for vote in cycle)))
+    to_reask = votes.get_votes_to_reask()
+    if to_reask:
+        logging.warning("re-ask to resolve the conflicts: {}".format(", ".join(vote.format() for vote in to_reask)))
+
+
+@typechecked
+def _check_and_write_csv(sorted_list: Items, user_vote_ui_maker: UserVoteUiMaker):
+    """Log the votes contradicting a list sorted in one go, then enrich and write it."""
+    checker = SortedListVoteChecker(user_vote_ui_maker.get_votes())
+    checker.on_load(sorted_list.get_items())
+    enrich_and_write_csv(sorted_list, user_vote_ui_maker.get_votes(), user_vote_ui_maker.get_writer())
+    logging.warning(f"found {len(checker.get_not_matching())} not matching votes")
+
+
+@typechecked
+def _load_previous_order(items: Items, sorted_filename: str, votes: VotesCache) -> list:
+    """Leading items of a previous output still in items, as far as votes imply its order, [] if there is none.
+
+    Items removed from items are dropped, the previous output may hold only part of the items. The
+    order is kept up to the first pair of neighbours votes do not order (an output ranked by
+    scores, see SortStrategy.Score), the items from there on are inserted again.
+    """
+    if not os.path.exists(sorted_filename):
+        return []
+    try:
+        previous_ids = Items(sorted_filename).get_ids()
+    except (ValueError, TypeError, KeyError) as error:
+        logging.warning(f"ignoring unreadable previous output {sorted_filename}: {error}")
+        return []
+    previous_order = [item for item in map(items.find_item_by_id, previous_ids) if item is not None]
+    graph = votes.get_graph()
+    kept = previous_order[:1]
+    for previous, item in zip(previous_order, previous_order[1:]):
+        if graph.compare_ids(item.get_id(), previous.get_id()) not in (0, 1):
+            break
+        kept.append(item)
+    logging.info(f"{len(kept)} items kept from {sorted_filename}, {len(previous_order) - len(kept)} inserted again, "
+                 f"{len(previous_ids) - len(previous_order)} removed")
+    return kept
 
 
-@typeguard.typechecked
-def sort_items_from_csv(filename: str, mode: SortStrategy = SortStrategy.PrioritizeCertaintyCertainMidFirst):
-    items = Items(filename)
-    items.print()
-    user_vote_ui_maker = UserVoteUiMaker(filename + ".votes", items)
+@typechecked
+def sort_items_from_csv(filename: str, mode: SortStrategy = SortStrategy.PrioritizeCertaintyCertainMidFirst,
+                        voter: Optional[Voter] = None, sync_votes: bool = True,
+                        vote_store_factory: Optional[Callable] = None, top_k: int = DEFAULT_TOP_K,
+                        metrics_filename: Optional[str] = None):
+    """vote_store_factory(items) builds the VoteStore of the votes, see vote_stores.py.
 
-    @typeguard.typechecked
+    top_k is the number of items ranked by SortStrategy.TopK. The metrics of the run are written
+    to metrics_filename if given, see Metrics.write.
+    """
+    METRICS.reset()
+    try:
+        with METRICS.timer("session"):
+            with METRICS.timer("items_csv_load"):
+                items = Items(filename)
+            items.print()
+            vote_store = None if vote_store_factory is None else vote_store_factory(items)
+            user_vote_ui_maker = UserVoteUiMaker(filename + ".votes", items, voter, sync_votes, vote_store)
+            try:
+                return sort_items(items, user_vote_ui_maker, filename + ".out.csv", mode, top_k)
+            finally:
+                # also when a voter stops the run: the votes and outputs queued so far reach the disk
+                user_vote_ui_maker.close()
+    finally:
+        if metrics_filename is not None:
+            METRICS.write(metrics_filename)
+
+
+@typechecked
+def sort_items(items: Items, user_vote_ui_maker: UserVoteUiMaker, sorted_filename: str, mode: SortStrategy,
+               top_k: int = DEFAULT_TOP_K):
+    """Sort items asking user_vote_ui_maker, whose owner closes it once done with its votes."""
+    @typechecked
     def cmp_implementation_func(item1: ItemWrapper, item2: ItemWrapper):
         if item1.get_id() == item2.get_id():
             raise NotImplementedError()
@@ -35,15 +125,55 @@ def sort_items_from_csv(filename: str, mode: SortStrategy = SortStrategy.Priorit
         sorted_dict = sorted(items.get_wrapped_items_randomized(), key=functools.cmp_to_key(cmp_implementation_func),
                              reverse=True)
         return sorted_dict
-    elif mode == SortStrategy.PrioritizeCertainty or mode == SortStrategy.PrioritizeCertaintyCertainMidFirst:
-        sorted_list = Items(filename + ".out.csv", load_csv=False)
-        items_prioritized = user_vote_ui_maker.get_items_sorted_by_certainty()
+    elif mode == SortStrategy.Score:
+        # no questions: best ranking the existing votes support, even inconsistent or incomplete ones
+        sorted_list = Items(sorted_filename, load_csv=False)
+        sorted_list.get_items().extend(sort_items_by_votes(items, user_vote_ui_maker.get_votes()))
+        enrich_and_write_csv(sorted_list, user_vote_ui_maker.get_votes(), user_vote_ui_maker.get_writer())
+        return sorted_list
+    elif mode == SortStrategy.MergeInsertion:
+        # items csv order, so that a re-run makes the same comparisons and they all come from cached votes
+        sorted_list = Items(sorted_filename, load_csv=False)
+        sorted_list.get_items().extend(merge_insertion_sort(items.get_wrapped_items(), cmp_implementation_func))
+        _check_and_write_csv(sorted_list, user_vote_ui_maker)
+        return sorted_list
+    elif mode == SortStrategy.TournamentRounds:
+        # items csv order, so that a re-run asks the same rounds: see voters.CsvRoundVoter
+        sorted_list = Items(sorted_filename, load_csv=False)
+        sorted_list.get_items().extend(round_insertion_sort(items.get_wrapped_items(),
+                                                            user_vote_ui_maker.get_known_cmp,
+                                                            user_vote_ui_maker.ask_voter_round))
+        _check_and_write_csv(sorted_list, user_vote_ui_maker)
+        return sorted_list
+    elif mode == SortStrategy.TopK:
+        # biggest first by the scores of the existing votes, so most of the others are dropped with one question
+        candidates = sort_items_by_score(items, user_vote_ui_maker.get_votes())
+        candidates.reverse()
+        sorted_list = Items(sorted_filename, load_csv=False)
+        sorted_list.get_items().extend(top_k_insertion(candidates, cmp_implementation_func, top_k))
+        _check_and_write_csv(sorted_list, user_vote_ui_maker)
+        return sorted_list
+    elif mode in (SortStrategy.PrioritizeCertainty, SortStrategy.PrioritizeCertaintyCertainMidFirst,
+                  SortStrategy.PrioritizeCertaintyInformationGain):
+        votes = user_vote_ui_maker.get_votes()
+        # previous run output: only the items missing from it are inserted
+        sorted_list = Items(sorted_filename, load_csv=False)
+        sorted_list.get_items().extend(_load_previous_order(items, sorted_filename, votes))
+        checker = SortedListVoteChecker(votes)
+        checker.on_load(sorted_list.get_items())
+        already_sorted = set(item.get_id() for item in sorted_list.get_items())
+        items_prioritized = [item for item in user_vote_ui_maker.get_items_sorted_by_certainty()
+                             if item.get_id() not in already_sorted]
         item_package.cmp_imp = cmp_implementation_func
         items_prioritized.reverse()
         for next_element in items_prioritized:
-            logging.debug("Before insort: {}".format(sorted_list))
+            # lazy: formatting the whole list on every insertion is quadratic
+            logging.debug("Before insort: %s", sorted_list)
             if mode == SortStrategy.PrioritizeCertainty:
-                bisect.insort(sorted_list.get_items(), next_element)
+                index = bisect_fork.insort_right_cmp(sorted_list.get_items(), next_element, cmp_implementation_func)
+            elif mode == SortStrategy.PrioritizeCertaintyInformationGain:
+                index = insort_most_informative(sorted_list.get_items(), next_element, cmp_implementation_func, votes,
+                                                user_vote_ui_maker.get_known_cmp)
             else:
                 def mid_func_imp(a, lo, hi):
                     mid = (lo + hi) // 2
@@ -54,29 +184,19 @@ def sort_items_from_csv(filename: str, mode: SortStrategy = SortStrategy.Priorit
                             alternativemid = mid + inc * inc2
                             assert alternativemid > lo
                             assert alternativemid < hi
-                            if user_vote_ui_maker.get_votes().has_certain_vote(next_element, a[alternativemid]):
+                            if votes.has_certain_vote(next_element, a[alternativemid]):
                                 return alternativemid
                     return mid
 
-                bisect_fork.insort(sorted_list.get_items(), next_element, mid_func=mid_func_imp)
-            logging.debug("After insort: {}".format(sorted_list))
-            sorted_list.write_csv()
-            not_matching = user_vote_ui_maker.find_votes_not_matching_list(sorted_list)
-            logging.warning(f"found {len(not_matching)} not matching votes")
-        user_vote_ui_maker.get_votes().enrich_items_with_stats(sorted_list)
-        sorted_list.write_csv()
-        logging.warning(f"found {len(not_matching)} not matching votes")
+                index = bisect_fork.insort_right_cmp(sorted_list.get_items(), next_element, cmp_implementation_func,
+                                                     mid_func=mid_func_imp)
+            logging.debug("After insort: %s", sorted_list)
+            sorted_list.write_csv(user_vote_ui_maker.get_writer())
+            checker.on_insert(sorted_list.get_items(), index)
+            logging.warning(f"found {len(checker.get_not_matching())} not matching votes")
+        enrich_and_write_csv(sorted_list, votes, user_vote_ui_maker.get_writer())
+        logging.warning(f"found {len(checker.get_not_matching())} not matching votes")
         return sorted_list
     else:
         raise NotImplementedError()
 
-
-@typeguard.typechecked
-def sort_items_from_csv_loop(filename: str, mode):
-    while True:
-        logging.debug("{} Loop start".format(__name__))
-        try:
-            sorted_items = sort_items_from_csv(filename, mode)
-            return sorted_items
-        except VoteUndecidedException:
-            pass
@@ -0,0 +1,36 @@
+import numpy as np
+
+from scoring import fit_bradley_terry, score_items, sort_items_by_votes
+from votes import VotesCache
+
+CHAIN_LENGTH = 2000
+
+
+def test_chain_of_votes_keeps_its_order(make_items):
+    items = make_items(CHAIN_LENGTH)
+    wrapped_items = items.get_wrapped_items()
+    votes = VotesCache(items)
+    # item i + 1 > item i, in a random order of votes
+    for index in np.random.default_rng(0).permutation(CHAIN_LENGTH - 1).tolist():
+        votes.add(wrapped_items[index + 1], wrapped_items[index], wrapped_items[index + 1])
+    assert sort_items_by_votes(items, votes) == wrapped_items
+
+    scores = score_items(items, votes)
+    steps = np.diff([scores[item.get_id()][0] for item in wrapped_items])
+    # the prior flattens the middle of the chain, it never inverts it
+    assert (steps >= 0).all()
+    assert (steps[:10] > 0).all() and (steps[-10:] > 0).all()
+
+
+def test_bradley_terry_orders_dense_votes():
+    rng = np.random.default_rng(1)
+    strengths = np.linspace(-2.0, 2.0, 50)
+    first, second = rng.integers(0, 50, (2, 5000))
+    first, second = first[first != second], second[first != second]
+    first_wins = rng.random(len(first)) < 1.0 / (1.0 + np.exp(strengths[second] - strengths[first]))
+    winners = np.where(first_wins, first, second)
+    losers = np.where(first_wins, second, first)
+    empty = np.array([], dtype=np.int64)
+    scores, errors = fit_bradley_terry(50, winners, losers, empty, empty)
+    assert np.corrcoef(scores, strengths)[0, 1] > 0.98
+    assert (errors < 0.5).all()
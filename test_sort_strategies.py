@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from merge_insertion import merge_insertion_sort
+from sort_items import SortStrategy, sort_items
+from top_k import top_k_insertion
+from tournament_rounds import round_insertion_sort
+from user_questions import UserVoteUiMaker
+from voters import CallbackVoter
+
+# fewest comparisons that sort every order of n elements (n = 0 to 12)
+MINIMUM_WORST_CASE_COMPARISONS = [0, 0, 1, 3, 5, 7, 10, 13, 16, 19, 22, 26, 30]
+
+
+class _CountingCmp:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, x, y):
+        self.count += 1
+        return (x > y) - (x < y)
+
+
+def test_merge_insertion_sorts_with_fewest_comparisons():
+    rnd = random.Random(0)
+    for count, minimum in enumerate(MINIMUM_WORST_CASE_COMPARISONS):
+        for _ in range(20):
+            elements = rnd.sample(range(100), count)
+            cmp = _CountingCmp()
+            assert merge_insertion_sort(elements, cmp) == sorted(elements)
+            assert cmp.count <= minimum
+
+
+def test_round_insertion_sort_asks_independent_rounds():
+    elements = random.Random(1).sample(range(1000), 200)
+    known = {}
+    rounds = []
+
+    def ask_round(pairs):
+        rounds.append(pairs)
+        answers = []
+        for x, y in pairs:
+            known[(x, y)] = (x > y) - (x < y)
+            known[(y, x)] = -known[(x, y)]
+            answers.append(known[(x, y)])
+        return answers
+
+    assert round_insertion_sort(elements, lambda x, y: known.get((x, y)), ask_round, round_size=10) == \
+        sorted(elements)
+    for pairs in rounds:
+        assert 0 < len(pairs) <= 10
+        # one step of each active element
+        assert len(set(x for x, _ in pairs)) == len(pairs)
+    assert len(rounds) < 200
+
+
+def test_top_k_keeps_biggest_in_order():
+    elements = random.Random(2).sample(range(1000), 300)
+    cmp = _CountingCmp()
+    assert top_k_insertion(elements, cmp, 10) == sorted(elements)[-10:]
+    assert cmp.count < 2 * len(elements)
+    with pytest.raises(ValueError):
+        top_k_insertion(elements, cmp, 0)
+
+
+# Random sorts with a randomized cmp and Score asks nothing
+@pytest.mark.parametrize("strategy", [strategy for strategy in SortStrategy
+                                      if strategy not in (SortStrategy.Random, SortStrategy.Score)])
+def test_strategy_sorts_with_simulated_voter(make_items, items_filename, strategy):
+    items = make_items(40)
+    hidden_order = list(range(1, 41))
+    random.Random(3).shuffle(hidden_order)
+    hidden_rank = {item_id: rank for rank, item_id in enumerate(hidden_order)}
+    voter = CallbackVoter(lambda x, y: x if hidden_rank[x.get_id()] > hidden_rank[y.get_id()] else y)
+    user_vote_ui_maker = UserVoteUiMaker(items_filename + ".votes", items, voter, sync_votes=False)
+    try:
+        result = sort_items(items, user_vote_ui_maker, items_filename + ".out.csv", strategy, top_k=5)
+    finally:
+        user_vote_ui_maker.close()
+    ranks = [hidden_rank[item.get_id()] for item in (result if isinstance(result, list) else result.get_items())]
+    if strategy == SortStrategy.TopK:
+        assert ranks == list(range(35, 40))
+    else:
+        assert ranks == list(range(40))
@@ -0,0 +1,25 @@
+from votes import VotesCache
+
+
+def _build_votes(make_items, votes: list) -> VotesCache:
+    items = make_items(6)
+    votes_cache = VotesCache(items)
+    for timestamp, (bigger_id, smaller_id) in enumerate(votes):
+        bigger = items.find_item_by_id(bigger_id)
+        votes_cache.add(bigger, items.find_item_by_id(smaller_id), bigger, float(timestamp))
+    return votes_cache
+
+
+def test_overlapping_cycles_reask_shared_vote(make_items):
+    a, b, c, d = 1, 2, 3, 4
+    votes_cache = _build_votes(make_items, [(a, b), (b, c), (c, a), (b, d), (d, a)])
+    assert len(votes_cache.get_conflicts()) == 2
+    to_reask = votes_cache.get_votes_to_reask()
+    assert [(vote.get_bigger().get_id(), vote.get_smaller().get_id()) for vote in to_reask] == [(a, b)]
+
+
+def test_disjoint_cycles_reask_newest_vote_of_each(make_items):
+    a, b, c, d, e, f = 1, 2, 3, 4, 5, 6
+    votes_cache = _build_votes(make_items, [(a, b), (b, c), (c, a), (d, e), (e, f), (f, d)])
+    to_reask = votes_cache.get_votes_to_reask()
+    assert sorted(vote.get_timestamp() for vote in to_reask) == [2.0, 5.0]
@@ -0,0 +1,154 @@
+import random
+
+from vote_graph import VoteGraph
+from votes import VotesCache
+
+ITEM_COUNT = 20
+
+
+class _NaiveGraph:
+    """Votes as item edges, a tie being an edge each way, compared by searching every path."""
+
+    def __init__(self):
+        self.__edges = {}
+
+    def __reaches(self, start: int, target: int) -> bool:
+        seen = {start}
+        stack = [start]
+        while stack:
+            for other in self.__edges.get(stack.pop(), ()):
+                if other == target:
+                    return True
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return False
+
+    def compare(self, item1: int, item2: int):
+        down = self.__reaches(item1, item2)
+        up = self.__reaches(item2, item1)
+        if down and up:
+            return 0
+        return 1 if down else -1 if up else None
+
+    def add(self, bigger: int, smaller: int) -> bool:
+        if self.compare(bigger, smaller) in (0, -1):
+            return False
+        self.__edges.setdefault(bigger, set()).add(smaller)
+        return True
+
+    def add_tie(self, item1: int, item2: int) -> bool:
+        if self.compare(item1, item2) in (1, -1):
+            return False
+        self.__edges.setdefault(item1, set()).add(item2)
+        self.__edges.setdefault(item2, set()).add(item1)
+        return True
+
+
+def _random_votes(seed: int, count: int) -> list:
+    """(item1, item2, tied) votes, mostly following a hidden order so that few of them contradict."""
+    rnd = random.Random(seed)
+    rank = list(range(ITEM_COUNT))
+    rnd.shuffle(rank)
+    votes = []
+    for _ in range(count):
+        item1, item2 = rnd.sample(range(1, ITEM_COUNT + 1), 2)
+        if rnd.random() < 0.9 and rank[item1 - 1] < rank[item2 - 1]:
+            item1, item2 = item2, item1
+        votes.append((item1, item2, rnd.random() < 0.05))
+    return votes
+
+
+def _assert_same_answers(graph: VoteGraph, naive: _NaiveGraph):
+    for item1 in range(1, ITEM_COUNT + 1):
+        for item2 in range(1, ITEM_COUNT + 1):
+            if item1 != item2:
+                assert graph.compare_ids(item1, item2) == naive.compare(item1, item2), (item1, item2)
+
+
+def test_graph_answers_as_naive_closure():
+    for seed in range(10):
+        graph = VoteGraph()
+        naive = _NaiveGraph()
+        for step, (item1, item2, tied) in enumerate(_random_votes(seed, 40)):
+            if tied:
+                assert graph.add_tie(item1, item2) == naive.add_tie(item1, item2)
+            else:
+                assert graph.add(item1, item2) == naive.add(item1, item2)
+            if step % 7 == 0:
+                # caches the closure of some buckets, later adds must keep it up to date
+                graph.compare_ids(item1, item2)
+        _assert_same_answers(graph, naive)
+
+
+def test_graph_from_outcomes_and_state_answer_as_added_votes():
+    for seed in range(10):
+        graph = VoteGraph()
+        naive = _NaiveGraph()
+        outcomes = []
+        for item1, item2, tied in _random_votes(seed, 40):
+            if graph.add_tie(item1, item2) if tied else graph.add(item1, item2):
+                naive.add_tie(item1, item2) if tied else naive.add(item1, item2)
+                outcomes.append((item1, item2, None if tied else item1))
+        _assert_same_answers(VoteGraph.from_outcomes(outcomes), naive)
+
+        def load_item_outcomes(item_id):
+            return [outcome for outcome in outcomes if item_id in outcome[:2]]
+
+        _assert_same_answers(VoteGraph.from_state(graph.get_state(), load_item_outcomes), naive)
+
+
+def test_tied_items_share_the_order_of_their_bucket():
+    graph = VoteGraph()
+    assert graph.add_tie(1, 2)
+    assert graph.add(2, 3)
+    assert graph.add(4, 1)
+    assert graph.compare_ids(1, 2) == 0
+    assert graph.compare_ids(1, 3) == 1
+    assert graph.compare_ids(3, 4) == -1
+    # 3 < 1 and 2 < 4: tied with neither
+    assert not graph.add_tie(3, 1)
+    assert not graph.add_tie(2, 4)
+    assert graph.find_chain(4, 3) == [(4, 1), (1, 2), (2, 3)]
+
+
+def test_rejected_vote_leaves_the_order_untouched():
+    graph = VoteGraph()
+    assert graph.add(1, 2)
+    assert graph.add(2, 3)
+    assert not graph.add(3, 1)
+    assert graph.compare_ids(1, 3) == 1
+    assert graph.find_chain(1, 3) == [(1, 2), (2, 3)]
+
+
+def test_has_certain_vote_answers_from_cached_closure(make_items, monkeypatch):
+    items = make_items(62)
+    # a chain of 60 items, 61 and 62 are voted on later
+    wrapped_items, new_items = items.get_wrapped_items()[:60], items.get_wrapped_items()[60:]
+    votes = VotesCache(items)
+    for bigger, smaller in zip(wrapped_items[::-1], wrapped_items[-2::-1]):
+        votes.add(bigger, smaller, bigger)
+    graph = votes.get_graph()
+    # one walk down from the top and up from the bottom caches the closure of every bucket
+    assert votes.has_certain_vote(wrapped_items[-1], wrapped_items[0])
+    assert votes.has_certain_vote(wrapped_items[0], wrapped_items[-1])
+    cached = [dict(reach) for reach in graph._VoteGraph__reach]
+
+    def search(*args):
+        raise AssertionError("has_certain_vote searched the graph")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(VoteGraph, "_VoteGraph__search", search)
+        for item1 in wrapped_items:
+            for item2 in wrapped_items:
+                if item1 is not item2:
+                    assert votes.has_certain_vote(item1, item2)
+    assert [dict(reach) for reach in graph._VoteGraph__reach] == cached
+
+    # an added vote updates the cached closure instead of dropping it
+    votes.add(wrapped_items[0], new_items[0], wrapped_items[0])
+    with monkeypatch.context() as patch:
+        patch.setattr(VoteGraph, "_VoteGraph__search", search)
+        for item in wrapped_items:
+            assert votes.has_certain_vote(item, new_items[0])
+        assert not votes.has_certain_vote(new_items[1], new_items[0])
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import random
+
+from user_questions import UserVoteUiMaker
+from vote_server import VoteServer
+
+
+async def _request(port: int, request: bytes) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content) if content else None
+
+
+def _build_request(method: str, path: str, payload=None) -> bytes:
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    return f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+
+
+def test_server_sorts_with_answers_from_several_voters(make_items, items_filename):
+    items = make_items(30)
+    hidden_order = list(range(1, 31))
+    random.Random(0).shuffle(hidden_order)
+    hidden_rank = {item_id: rank for rank, item_id in enumerate(hidden_order)}
+    user_vote_ui_maker = UserVoteUiMaker(items_filename + ".votes", items, sync_votes=False)
+    server = VoteServer(items, user_vote_ui_maker, items_filename + ".out.csv", lanes=3, poll_seconds=0.1)
+
+    async def voter(name: str):
+        while True:
+            status, question = await _request(server.get_port(), _build_request("GET", f"/question?voter={name}"))
+            if status == 410:
+                return
+            if status != 200:
+                continue
+            rank1 = hidden_rank[question["item1"]["id"]]
+            rank2 = hidden_rank[question["item2"]["id"]]
+            await _request(server.get_port(), _build_request("POST", f"/answer?voter={name}",
+                                                              {"id": question["id"],
+                                                               "choice": "1" if rank1 > rank2 else "2"}))
+
+    async def session():
+        await server.start()
+        port = server.get_port()
+        for content_length in ("abc", "-1"):
+            request = f"POST /answer HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode("latin-1")
+            assert (await _request(port, request))[0] == 400
+        assert (await _request(port, _build_request("POST", "/answer", {"id": "x"})))[0] == 400
+        await asyncio.gather(*(voter(f"voter{number}") for number in range(3)))
+        return await server.wait_sorted()
+
+    try:
+        sorted_list = asyncio.run(session())
+    finally:
+        user_vote_ui_maker.close()
+    assert [hidden_rank[item.get_id()] for item in sorted_list.get_items()] == list(range(30))
@@ -0,0 +1,193 @@
+import random
+
+import pytest
+
+from vote_journal import VoteJournal
+from vote_stores import ArrayVoteStore, DictVoteStore, SqliteVoteStore, open_vote_snapshot, write_vote_snapshot
+from vote import ItemPairVote
+from votes import VotesCache
+
+ITEM_COUNT = 40
+
+
+def _add_random_votes(items, votes: VotesCache, count: int, seed: int = 0):
+    """Mostly consistent votes, with some ties and some contradicting ones."""
+    rnd = random.Random(seed)
+    wrapped_items = items.get_wrapped_items()
+    for timestamp in range(count):
+        item1, item2 = rnd.sample(wrapped_items, 2)
+        if votes.get(item1, item2) is not None:
+            continue
+        if rnd.random() < 0.1:
+            choice = None
+        elif rnd.random() < 0.9:
+            choice = max(item1, item2, key=lambda item: item.get_id())
+        else:
+            choice = min(item1, item2, key=lambda item: item.get_id())
+        votes.add(item1, item2, choice, float(timestamp))
+
+
+def _get_contents(items, votes: VotesCache) -> tuple:
+    """Votes by pair of ids whatever their item order, and the vote counts of every item."""
+    store = votes.get_store()
+    outcomes = sorted((min(item1_id, item2_id), max(item1_id, item2_id), bigger_id)
+                      for item1_id, item2_id, bigger_id in store.iter_outcomes())
+    timestamps = sorted((vote.get_key(), vote.get_timestamp()) for vote in votes.iter_votes())
+    return outcomes, timestamps, [store.get_item_vote_counts(item.get_id()) for item in items.get_wrapped_items()]
+
+
+def _by_item(graph_state: tuple) -> tuple:
+    """Bucket root and position by item id, and the rejected votes, of a graph state in any item order."""
+    item_ids, root_ids, positions, rejected = graph_state
+    return dict(zip(item_ids, zip(root_ids, positions))), sorted(rejected, key=repr)
+
+
+@pytest.fixture
+def votes_csv(make_items, items_filename):
+    """Items and the csv of random votes on them, with their contents in a DictVoteStore."""
+    items = make_items(ITEM_COUNT)
+    votes = VotesCache(items)
+    _add_random_votes(items, votes, 300)
+    filename = items_filename + ".votes.csv"
+    votes.save_to_csv_file(filename)
+    return items, filename, _get_contents(items, votes)
+
+
+@pytest.mark.parametrize("store_name", ["dict", "array", "sqlite"])
+def test_store_replays_votes_csv(votes_csv, store_name):
+    items, filename, expected = votes_csv
+    store = {"dict": lambda: DictVoteStore(),
+             # a small table, grown by the adds
+             "array": lambda: ArrayVoteStore(capacity=8),
+             "sqlite": lambda: SqliteVoteStore(filename + ".db", items, sync=False)}[store_name]()
+    votes = VotesCache(items, store)
+    votes.load_from_csv(filename)
+    assert _get_contents(items, votes) == expected
+    for item1 in items.get_wrapped_items()[:10]:
+        for item2 in items.get_wrapped_items():
+            if item1 is not item2:
+                assert store.contains(item1.get_id(), item2.get_id()) == (votes.get(item1, item2) is not None)
+    store.close()
+
+
+def test_sqlite_store_reopens_with_graph_state(votes_csv):
+    items, filename, expected = votes_csv
+    store = SqliteVoteStore(filename + ".db", items, sync=False)
+    votes = VotesCache(items, store)
+    votes.load_from_csv(filename)
+    votes.get_graph()
+    graph_state = votes.get_graph_state()
+    store.save_graph_state(graph_state)
+    store.close()
+
+    store = SqliteVoteStore(filename + ".db", items, sync=False)
+    assert _by_item(store.get_graph_state()) == _by_item(graph_state)
+    reopened = VotesCache(items, store)
+    assert _get_contents(items, reopened) == expected
+    assert len(reopened.get_conflicts()) == len(graph_state[3])
+    item1, item2 = next((item1, item2) for item1 in items.get_wrapped_items() for item2 in items.get_wrapped_items()
+                        if item1 is not item2 and reopened.get(item1, item2) is None)
+    reopened.add(item1, item2, item1)
+    # saved for fewer votes
+    assert store.get_graph_state() is None
+    store.close()
+
+
+def test_snapshot_round_trip(votes_csv):
+    items, filename, expected = votes_csv
+    votes = VotesCache(items, ArrayVoteStore())
+    votes.load_from_csv(filename)
+    votes.get_graph()
+    graph_state = votes.get_graph_state()
+    snapshot_filename = filename + ".snapshot"
+    write_vote_snapshot(snapshot_filename, votes.get_store(), filename, graph_state)
+
+    store = open_vote_snapshot(snapshot_filename, items, filename)
+    assert _by_item(store.get_graph_state()) == _by_item(graph_state)
+    mapped = VotesCache(items, store)
+    assert _get_contents(items, mapped) == expected
+    assert [vote.format() for vote in mapped.get_votes_to_reask()] == \
+        [vote.format() for vote in votes.get_votes_to_reask()]
+    store.close()
+
+    # stale once the votes csv changes
+    journal = VoteJournal(filename, sync=False)
+    journal.append(next(votes.iter_votes()))
+    journal.close()
+    assert open_vote_snapshot(snapshot_filename, items, filename) is None
+
+
+def test_journal_compaction_keeps_one_row_per_vote(make_items, items_filename):
+    items = make_items(ITEM_COUNT)
+    filename = items_filename + ".votes.csv"
+    votes = VotesCache(items)
+    _add_random_votes(items, votes, 100)
+    journal = VoteJournal(filename, sync=False)
+    journal.append_all(list(votes.iter_votes()))
+    # the same votes again, as replayed by an interrupted run
+    journal.append_all(list(votes.iter_votes()))
+    journal.compact(votes)
+    with open(filename, encoding='utf-8-sig') as csv_file:
+        assert len(csv_file.readlines()) == len(votes) + 1
+    # an interrupted run left half a row: it is skipped, and the next rows are kept apart
+    with open(filename, mode='a', encoding='utf-8') as csv_file:
+        csv_file.write("1,>")
+    wrapped_items = items.get_wrapped_items()
+    new_vote = next((item1, item2) for item1 in wrapped_items for item2 in wrapped_items
+                    if item1 is not item2 and votes.get(item1, item2) is None)
+    votes.add(*new_vote, new_vote[0])
+    journal.append(votes.get(*new_vote))
+    journal.close()
+    replayed = VotesCache(items)
+    assert replayed.load_from_csv(filename) == len(votes) + 1
+    assert _get_contents(items, replayed) == _get_contents(items, votes)
+
+
+@pytest.mark.parametrize("store_name", ["dict", "array", "sqlite", "snapshot"])
+def test_revote_replaces_the_vote_of_its_pair(votes_csv, store_name):
+    items, filename, _ = votes_csv
+    store = {"dict": lambda: DictVoteStore(),
+             "array": lambda: ArrayVoteStore(),
+             "sqlite": lambda: SqliteVoteStore(filename + ".db", items, sync=False),
+             "snapshot": lambda: ArrayVoteStore()}[store_name]()
+    loaded = VotesCache(items, store)
+    loaded.load_from_csv(filename)
+    loaded.get_graph()
+    store.save_graph_state(loaded.get_graph_state())
+    if store_name == "snapshot":
+        write_vote_snapshot(filename + ".snapshot", store, filename, loaded.get_graph_state())
+        store = open_vote_snapshot(filename + ".snapshot", items, filename)
+    # the graph state saved with the votes goes with the previous outcome
+    assert (store.get_graph_state() is not None) == (store_name in ("sqlite", "snapshot"))
+    votes = VotesCache(items, store)
+    reference = VotesCache(items)
+    reference.load_from_csv(filename)
+    votes.get_graph()
+    vote = next(vote for vote in votes.iter_votes() if vote.is_certain())
+    bigger, smaller = vote.get_bigger(), vote.get_smaller()
+    counts = [store.get_item_vote_counts(item.get_id()) for item in (bigger, smaller)]
+
+    journal = VoteJournal(filename, sync=False)
+    for choice, timestamp in ((smaller, 5000.0), (None, 5001.0)):
+        for cache in (votes, reference):
+            cache.add(bigger, smaller, choice, timestamp)
+        journal.append(votes.get(bigger, smaller))
+        revote = votes.get(smaller, bigger)
+        assert (revote.get_bigger() is None) == (choice is None) and revote.get_timestamp() == timestamp
+        if choice is not None:
+            assert revote.get_bigger().get_id() == choice.get_id()
+            assert [store.get_item_vote_counts(item.get_id()) for item in (bigger, smaller)] == counts
+        assert _get_contents(items, votes) == _get_contents(items, reference)
+        assert len(votes.get_conflicts()) == len(reference.get_conflicts())
+        assert [votes.get_inferred_cmp(smaller, item) for item in items.get_wrapped_items()] == \
+            [reference.get_inferred_cmp(smaller, item) for item in items.get_wrapped_items()]
+    journal.close()
+    assert [store.get_item_vote_counts(item.get_id()) for item in (bigger, smaller)] == \
+        [(certain - 1, uncertain + 1) for certain, uncertain in counts]
+    assert store.get_graph_state() is None
+    store.close()
+
+    # the later row of a pair wins
+    replayed = VotesCache(items)
+    replayed.load_from_csv(filename)
+    assert _get_contents(items, replayed) == _get_contents(items, reference)
@@ -0,0 +1,52 @@
+import csv
+
+import pytest
+
+from vote_journal import VoteJournal
+from voters import CallbackVoter, CsvRoundVoter, ScriptedVoter, UnansweredComparisonException
+from votes import VotesCache
+
+
+def test_scripted_voter_answers_in_any_order(make_items):
+    items = make_items(3)
+    item1, item2, item3 = items.get_wrapped_items()
+    voter = ScriptedVoter({(1, 2): 2, (3, 1): None}, fallback=CallbackVoter(lambda x, y: x))
+    assert voter.vote(item1, item2) is item2
+    assert voter.vote(item2, item1) is item2
+    assert voter.vote(item1, item3) is None
+    assert voter.vote(item3, item2) is item3
+    with pytest.raises(UnansweredComparisonException):
+        ScriptedVoter({}).vote(item1, item2)
+
+
+def test_scripted_voter_reads_votes_csv(make_items, items_filename):
+    items = make_items(3)
+    item1, item2, item3 = items.get_wrapped_items()
+    votes = VotesCache(items)
+    votes.add(item1, item2, item2)
+    votes.add(item2, item3, None)
+    journal = VoteJournal(items_filename + ".votes.csv", sync=False)
+    journal.append_all(list(votes.iter_votes()))
+    journal.close()
+    voter = ScriptedVoter.from_csv(items_filename + ".votes.csv")
+    assert voter.vote(item2, item1) is item2
+    assert voter.vote(item3, item2) is None
+
+
+def test_csv_round_voter_writes_round_then_reads_answers(make_items, items_filename):
+    items = make_items(4)
+    item1, item2, item3, item4 = items.get_wrapped_items()
+    voter = CsvRoundVoter(items_filename + ".round.csv")
+    pairs = [(item1, item2), (item3, item4)]
+    with pytest.raises(UnansweredComparisonException):
+        voter.vote_round(pairs)
+    with open(voter.get_filename(), newline='', encoding='utf-8-sig') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert [(int(row["item1_id"]), int(row["item2_id"]), row["vote"]) for row in rows] == [(1, 2, ""), (3, 4, "")]
+    rows[0]["vote"] = "2"
+    rows[1]["vote"] = "n"
+    with open(voter.get_filename(), mode='w', newline='', encoding='utf-8-sig') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CsvRoundVoter.CsvFieldNames.csv_headers)
+        writer.writeheader()
+        writer.writerows(rows)
+    assert voter.vote_round(pairs) == [item2, None]
@@ -0,0 +1,25 @@
+import bisect_fork
+from typechecking import typechecked
+
+DEFAULT_TOP_K = 20
+
+
+@typechecked
+def top_k_insertion(elements: list, cmp, k: int) -> list:
+    """The k biggest elements in ascending order, by binary insertion into a list bounded to k elements.
+
+    Once the list is full each element is first compared with its smallest one, and dropped
+    unless bigger: most elements cost a single comparison, about n + k log(n / k) log k for a
+    random order instead of n log n for a full sort, and fewer when the biggest come first.
+    Elements tied with the smallest one are dropped.
+    """
+    if k < 1:
+        raise ValueError(f"k must be positive: {k}")
+    top = []
+    for element in elements:
+        if len(top) < k:
+            bisect_fork.insort_right_cmp(top, element, cmp)
+        elif cmp(element, top[0]) > 0:
+            bisect_fork.insort_right_cmp(top, element, cmp, 1)
+            top.pop(0)
+    return top
@@ -0,0 +1,73 @@
+from typechecking import typechecked
+
+DEFAULT_ROUND_SIZE = 20
+
+
+@typechecked
+class _InsertionSearch:
+    """Binary search of the position of item in the chain, bounded by chain items (None: chain end)."""
+
+    def __init__(self, item):
+        self.item = item
+        self.lower = None
+        self.upper = None
+
+    def get_range(self, chain: list, position: dict):
+        lo = 0 if self.lower is None else position[id(self.lower)] + 1
+        hi = len(chain) if self.upper is None else position[id(self.upper)]
+        return lo, hi
+
+    def narrow(self, cmp: int, other, chain: list, position: dict):
+        if cmp < 0:
+            self.upper = other
+        elif cmp > 0:
+            self.lower = other
+        else:
+            # same bucket: right after other, like bisect_fork.bisect_right_cmp
+            self.lower = other
+            next_index = position[id(other)] + 1
+            self.upper = chain[next_index] if next_index < len(chain) else None
+
+
+@typechecked
+def round_insertion_sort(elements: list, known_cmp, ask_round, round_size: int = DEFAULT_ROUND_SIZE) -> list:
+    """Sort ascending by binary insertion of many elements at once, asking the comparisons in rounds.
+
+    known_cmp(x, y) returns the comparison if votes already answer it, else None. Every active
+    element makes one step of its binary search per round, so the unknown comparisons of a round
+    are independent of each other and ask_round(pairs) answers them all at once (a list of
+    comparisons). Up to round_size elements are active, and no more than the chain holds, so the
+    chain doubles in few rounds while it is small.
+    """
+    chain = []
+    pending = list(reversed(elements))
+    active = []
+    while pending or active:
+        while pending and len(active) < min(round_size, max(1, len(chain))):
+            active.append(_InsertionSearch(pending.pop()))
+        position = {id(item): index for index, item in enumerate(chain)}
+        questions = []
+        settled = {}
+        # one step per search and round, known or not: a re-run with the answers as votes goes through
+        # the same rounds, so it asks the same next round
+        for search in active:
+            lo, hi = search.get_range(chain, position)
+            if lo >= hi:
+                # one insertion per gap and round, the others now have it in their range
+                settled.setdefault(lo, search)
+                continue
+            other = chain[(lo + hi) // 2]
+            cmp = known_cmp(search.item, other)
+            if cmp is None:
+                questions.append((search, other))
+            else:
+                search.narrow(cmp, other, chain, position)
+        if questions:
+            cmps = ask_round([(search.item, other) for search, other in questions])
+            for (search, other), cmp in zip(questions, cmps):
+                search.narrow(cmp, other, chain, position)
+        for index in sorted(settled, reverse=True):
+            chain.insert(index, settled[index].item)
+        inserted = set(map(id, settled.values()))
+        active = [search for search in active if id(search) not in inserted]
+    return chain
@@ -0,0 +1,16 @@
+"""Runtime type checking switch, read once at import time.
+
+Classes and functions are decorated with typechecked from this module instead of typeguard's.
+By default it is typeguard.typechecked, so every call checks its annotated argument and return
+types. With LIST_SORT_TYPECHECK=0 in the environment it is a no-op decorator: nothing is
+instrumented and typeguard is not even imported.
+"""
+import os
+
+TYPECHECK = os.environ.get("LIST_SORT_TYPECHECK", "1") != "0"
+
+if TYPECHECK:
+    from typeguard import typechecked
+else:
+    def typechecked(target):
+        return target
@@ -1,51 +1,19 @@
 import logging
 import os
-import pickle
-import sys
 from typing import Optional
 
-import typeguard
-
-from config import fail_on_vote_undecide
+from background_writer import BackgroundWriter
 from item import ItemWrapper
 from items import Items
+from metrics import METRICS
+from typechecking import typechecked
+from vote_journal import VoteJournal
+from vote_stores import MappedVoteStore, open_vote_snapshot, write_vote_snapshot
+from voters import TerminalVoter, Voter
 from votes import VotesCache
 
 
-class VoteUndecidedException(Exception):
-    pass
-
-
-@typeguard.typechecked
-def _question(item1: ItemWrapper, item2: ItemWrapper):
-    assert item1.get_id() != item2.get_id()
-    while True:
-        sys.stdout.write(
-            "Witch one rate higher? 1:<<<{0}>>> , 2:<<<{1}>>> n:cannot say?".format(item1.format_short(),
-                                                                                    item2.format_short()))
-        if True:
-            choice = input().lower()
-        else:
-            choice = True
-
-        if choice == '2':
-            # arg1<arg2
-            bigger = item2
-            break
-        elif choice == '1':
-            # arg1>arg2
-            bigger = item1
-            break
-        elif choice == 'n':
-            # arg1>arg2
-            bigger = None
-            break
-        else:
-            sys.stdout.write(f"bad answer {choice}")
-    return bigger
-
-
-@typeguard.typechecked
+@typechecked
 def _get_cmp_ret(item1: ItemWrapper, item2: ItemWrapper, choice: Optional[ItemWrapper]):
     if choice is item2:
         ret = -1
@@ -53,58 +21,136 @@ def _get_cmp_ret(item1: ItemWrapper, item2: ItemWrapper, choice: Optional[ItemWr
         # arg1>arg2
         ret = 1
     elif choice is None:
-        if fail_on_vote_undecide:
-            raise VoteUndecidedException()
-        else:
-            ret = 0
+        # undecided: both items go to the same bucket
+        ret = 0
     else:
         raise Exception()
     return ret
 
 
-@typeguard.typechecked
+@typechecked
 class UserVoteUiMaker:
-    def __load_from_pickle(self, filename):
-        with open(filename, 'rb') as file:
-            logging.debug("loading previous cache")
-            self.__votes = pickle.load(file)
-            assert isinstance(self.__votes, VotesCache)
-            self.__votes.print()
-
-    def __save_to_file(self):
-        with open(self.__pickle_filename(), 'wb') as file:
-            pickle.dump(self.__votes, file)
-        self.__votes.save_to_csv_file(self.__csv_filename())
-
     def __pickle_filename(self):
         return self.__filename_base + ".pickle"
 
     def __csv_filename(self):
         return self.__filename_base + ".csv"
 
-    def __init__(self, filename, items: Items):
+    def __snapshot_filename(self):
+        return self.__filename_base + ".snapshot"
+
+    def __init__(self, filename, items: Items, voter: Optional[Voter] = None, sync_votes: bool = True,
+                 vote_store=None):
+        """Votes not in the cache are asked to voter, by default in the terminal.
+
+        Each new vote is appended to the votes csv, and fsynced unless sync_votes is False (headless
+        runs that can be replayed), by a background writer shared with the outputs (get_writer), so
+        that the next question does not wait on disk: close flushes it. vote_store is passed to
+        VotesCache: the votes csv is only replayed into an empty store, a persistent one
+        (SqliteVoteStore) already holds the votes, and the vote graph state close saves in it.
+        Without vote_store, the votes are mapped from the snapshot close writes next to the votes
+        csv (see MappedVoteStore) while it is up to date.
+        """
         self.__filename_base = filename
-        if os.path.exists((self.__pickle_filename())):
-            self.__load_from_pickle(self.__pickle_filename())
-        else:
-            self.__votes = VotesCache(items)
-        if os.path.exists(self.__csv_filename()):
-            self.__votes.load_from_csv(self.__csv_filename())
+        self.__voter = TerminalVoter() if voter is None else voter
+        self.__comparison_count = 0
+        self.__question_count = 0
+        self.__closed = False
+        self.__use_snapshot = vote_store is None
+        if self.__use_snapshot:
+            with METRICS.timer("vote_snapshot_open"):
+                vote_store = open_vote_snapshot(self.__snapshot_filename(), items, self.__csv_filename())
+        self.__votes = VotesCache(items, vote_store)
+        if os.path.exists(self.__pickle_filename()):
+            # written by older versions together with the csv, which holds the same votes
+            logging.warning("ignoring legacy vote cache {}".format(self.__pickle_filename()))
+        self.__writer = BackgroundWriter()
+        self.__journal = VoteJournal(self.__csv_filename(), sync=sync_votes, background_writer=self.__writer)
+        if os.path.exists(self.__csv_filename()) and len(self.__votes) == 0:
+            with METRICS.timer("vote_csv_load"):
+                rows_read = self.__votes.load_from_csv(self.__csv_filename())
+            if rows_read != len(self.__votes) + self.__votes.get_detached_row_count():
+                self.compact_votes()
+
+    def compact_votes(self):
+        self.__journal.compact(self.__votes)
+
+    def get_writer(self) -> BackgroundWriter:
+        return self.__writer
+
+    def close(self):
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__journal.close()
+        self.__writer.close()
+        store = self.__votes.get_store()
+        graph_state = self.__votes.get_graph_state()
+        if graph_state is not None:
+            store.save_graph_state(graph_state)
+        # votes on items removed from the list are only in the csv, replay it while there are any
+        if self.__use_snapshot and self.__votes.get_detached_row_count() == 0 and len(self.__votes) > 0 and \
+                (not isinstance(store, MappedVoteStore) or store.get_added_count() > 0 or
+                 graph_state is not None and store.get_graph_state() is None):
+            with METRICS.timer("vote_snapshot_write"):
+                write_vote_snapshot(self.__snapshot_filename(), store, self.__csv_filename(), graph_state)
+        store.close()
 
     def cmp_query_cache_or_ask_user_implementation(self, item1: ItemWrapper, item2: ItemWrapper):
         # return 1 if a > b else 0 if a == b else -1
+        known = self.get_known_cmp(item1, item2)
+        if known is not None:
+            return known
+        self.__question_count += 1
+        METRICS.increment("questions")
+        with METRICS.timer("voter_think"):
+            bigger = self.__voter.vote(item1, item2)
+        return self.record_vote(item1, item2, bigger)
+
+    def get_known_cmp(self, item1: ItemWrapper, item2: ItemWrapper) -> Optional[int]:
+        """Comparison from a direct or inferred vote, None if it has to be asked."""
+        self.__comparison_count += 1
+        METRICS.increment("comparisons")
         found_in_cache = self.__votes.get(item1, item2)
         if found_in_cache is not None:
-            bigger = found_in_cache.get_choice()
-        else:
-            bigger = _question(item1, item2)
+            METRICS.increment("cache_hits_direct")
+            return _get_cmp_ret(item1, item2, found_in_cache.get_choice())
+        inferred = self.__votes.get_inferred_cmp(item1, item2)
+        if inferred is not None:
+            METRICS.increment("cache_hits_inferred")
+        return inferred
+
+    def record_vote(self, item1: ItemWrapper, item2: ItemWrapper, bigger: Optional[ItemWrapper]) -> int:
+        """Store and journal an answer (bigger item or None) for a pair without vote, returns its comparison."""
+        return self.__record_votes([(item1, item2)], [bigger])[0]
+
+    def ask_voter_round(self, pairs: list) -> list:
+        """Ask the voter a round of independent (item1, item2) comparisons at once, returns their comparisons.
+
+        The round is journaled with a single flush.
+        """
+        self.__question_count += len(pairs)
+        METRICS.increment("questions", len(pairs))
+        with METRICS.timer("voter_think"):
+            answers = self.__voter.vote_round(pairs)
+        return self.__record_votes(pairs, answers)
+
+    def __record_votes(self, pairs: list, answers: list) -> list:
+        rets = []
+        for (item1, item2), bigger in zip(pairs, answers):
             if not (bigger is None or isinstance(bigger, ItemWrapper)):
                 raise Exception()
             self.__votes.add(item1, item2, bigger)
-            self.__save_to_file()
+            rets.append(_get_cmp_ret(item1, item2, bigger))
+        with METRICS.timer("vote_journal_append"):
+            self.__journal.append_all([self.__votes.get(item1, item2) for item1, item2 in pairs])
+        return rets
+
+    def get_comparison_count(self):
+        return self.__comparison_count
 
-        ret = _get_cmp_ret(item1, item2, bigger)
-        return ret
+    def get_question_count(self):
+        return self.__question_count
 
     def get_elements_with_known_votes(self):
         known, unknown = self.__votes.get_elements_with_known_votes()
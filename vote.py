@@ -2,45 +2,33 @@ import logging
 import time
 from typing import Optional
 
-import typeguard
-
 import common_utils
 from item import ItemWrapper
+from typechecking import typechecked
 
 
-@typeguard.typechecked
-class ItemPairVoteKey:
-    def __init__(self, item1: ItemWrapper, item2: ItemWrapper):
-        self.__item1 = item1
-        self.__item2 = item2
+# ids below this limit are packed in a single int: (min_id << 32) | max_id
+_PACKED_ID_LIMIT = 1 << 32
 
-    def build_key(self):
-        return tuple(sorted((self.__item1.get_id(), self.__item2.get_id())))
 
-    def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ItemPairVoteKey):
-            key1 = self.build_key()
-            key2 = other.build_key()
-            cmp_result = key1 == key2
-            return cmp_result
-        return False
+def build_pair_key(item1_id: int, item2_id: int):
+    """Order independent dict key for a pair of item ids.
 
-    def __hash__(self):
-        return hash(self.build_key())
-
-    def __repr__(self):
-        type_ = type(self)
-        module = type_.__module__
-        qualname = type_.__qualname__
-        return f"<{module}.{qualname} {self.build_key()} object at {hex(id(self))}>"
+    Not typechecked: it is called for every vote lookup.
+    """
+    if item1_id > item2_id:
+        item1_id, item2_id = item2_id, item1_id
+    if item2_id < _PACKED_ID_LIMIT:
+        return (item1_id << 32) | item2_id
+    return item1_id, item2_id
 
 
-@typeguard.typechecked
+@typechecked
 class ItemPairVote:
     def __init__(self, item1: ItemWrapper, item2: ItemWrapper, choice: Optional[ItemWrapper], timestamp: float = None):
         self.__item1 = item1
         self.__item2 = item2
+        self.__key = build_pair_key(item1.get_id(), item2.get_id())
         self.__choice = choice
         if timestamp is None:
             self.__timestamp = time.time()
@@ -49,15 +37,18 @@ class ItemPairVote:
         self.check_integrity()
 
     def get_key(self):
-        return self.get_key_static(self.__item1, self.__item2)
+        return self.__key
 
     @staticmethod
-    def get_key_static(x: ItemWrapper, y: ItemWrapper) -> ItemPairVoteKey:
-        return ItemPairVoteKey(x, y)
+    def get_key_static(x: ItemWrapper, y: ItemWrapper):
+        return build_pair_key(x.get_id(), y.get_id())
 
     def get_choice(self) -> Optional[ItemWrapper]:
         return self.__choice
 
+    def get_timestamp(self) -> float:
+        return self.__timestamp
+
     def format(self):
         if self.__choice is None:
             return "{} ? {}".format(self.__item1.format_short(), self.__item2.format_short())
@@ -119,43 +110,9 @@ class ItemPairVote:
             return self.__item2
         raise NotImplementedError()
 
-    def __match1(self, item1: ItemWrapper, item2: ItemWrapper, choice, timestamp: float) -> bool:
-        if choice != ">":
-            return False
-        if self.get_bigger() is None:
-            return False
-        if item1.get_id() != self.get_bigger().get_id():
-            return False
-        if item2.get_id() != self.get_smaller().get_id():
-            return False
-        if self.__timestamp != timestamp:
-            return False
-        return True
-
     def check_integrity(self):
         assert self.__item1.get_id() != self.__item2.get_id()
 
-    def __match2(self, item1: ItemWrapper, item2: ItemWrapper, choice, timestamp: float) -> bool:
-        self.check_integrity()
-        if choice != "?":
-            return False
-        if self.__choice is not None:
-            return False
-        if item1.get_id() not in (self.__item1.get_id(), self.__item2.get_id()):
-            return False
-        if item2.get_id() not in (self.__item1.get_id(), self.__item2.get_id()):
-            return False
-        if self.__timestamp != float(timestamp):
-            return False
-        return True
-
-    def add(self, bigger: ItemWrapper, smaller: ItemWrapper, choice, timestamp: float):
-        if self.__match1(bigger, smaller, choice, timestamp):
-            return
-        if self.__match2(bigger, smaller, choice, timestamp):
-            return
-        raise NotImplementedError()
-
     def __repr__(self):
         return common_utils.common_repr(self, f"{self.format()}")
 
@@ -180,20 +137,18 @@ class ItemPairVote:
     def is_uncertain(self):
         return self.__choice is None
 
-    def matches_list(self, items)-> bool:
+    def matches_positions(self, position_by_id: dict) -> bool:
+        """False if both items have a position (item id -> index in an ascending list) contradicting the vote."""
         if self.__choice is None:
             return True
-        bigger = self.get_bigger()
-        smaller = self.get_smaller()
-        try:
-            bigger_index = items.index(bigger)
-        except:
-            return True
-        try:
-            smaller_index = items.index(smaller)
-        except:
+        bigger_index = position_by_id.get(self.get_bigger().get_id())
+        smaller_index = position_by_id.get(self.get_smaller().get_id())
+        if bigger_index is None or smaller_index is None:
             return True
         if not bigger_index > smaller_index:
-            logging.warning(f"broke integrity in {len(items)} item list: {self}")
+            self.log_not_matching(len(position_by_id))
             return False
-        return True
\ No newline at end of file
+        return True
+
+    def log_not_matching(self, item_count: int):
+        logging.warning(f"broke integrity in {item_count} item list: {self}")
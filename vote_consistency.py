@@ -0,0 +1,38 @@
+from item import ItemWrapper
+from typechecking import typechecked
+from vote import ItemPairVote
+from votes import VotesCache
+
+
+@typechecked
+class SortedListVoteChecker:
+    """Votes contradicting the order of a sorted list that grows by insertions.
+
+    Inserting an item does not change the relative order of the items already in the list, so
+    after each insertion only the votes of the inserted item need to be checked.
+    """
+
+    def __init__(self, votes: VotesCache):
+        self.__votes = votes
+        self.__ids = []  # type: list[int]
+        self.__position_by_id = {}  # type: dict[int, int]
+        self.__not_matching = {}  # type: dict[int, ItemPairVote]
+
+    def on_load(self, items: list):
+        """Start from an already sorted list, checking its votes in a single pass."""
+        self.__ids = [item.get_id() for item in items]
+        self.__position_by_id = {item_id: position for position, item_id in enumerate(self.__ids)}
+        self.__not_matching = {vote.get_key(): vote for vote in
+                               self.__votes.get_store().find_votes_not_matching_positions(self.__position_by_id)}
+
+    def on_insert(self, items: list, index: int):
+        inserted = items[index]
+        assert isinstance(inserted, ItemWrapper)
+        self.__ids.insert(index, inserted.get_id())
+        self.__position_by_id.update(zip(self.__ids[index:], range(index, len(self.__ids))))
+        for vote in self.__votes.get_item_votes(inserted):
+            if not vote.matches_positions(self.__position_by_id):
+                self.__not_matching[vote.get_key()] = vote
+
+    def get_not_matching(self) -> list:
+        return list(self.__not_matching.values())
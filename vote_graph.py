@@ -0,0 +1,401 @@
+from collections import defaultdict
+from typing import Callable, Optional
+
+from typechecking import typechecked
+
+_DOWN = 0
+_UP = 1
+
+
+class _LazyAdjacency(dict):
+    """Edge sets by bucket root of a graph restored by VoteGraph.from_state, loaded on first access."""
+
+    def __init__(self, load: Callable):
+        super().__init__()
+        self.__load = load
+
+    def __missing__(self, root):
+        self.__load(root)
+        return self[root]
+
+
+@typechecked
+class VoteGraph:
+    """Order of items given by votes, maintained incrementally as votes are added.
+
+    Items tied by undecided votes share a bucket (union-find). Buckets are the nodes of a DAG with
+    an edge from the bigger to the smaller one of every vote, kept in a topological order
+    (Pearce-Kelly): a vote in that order is added as is, and one against it only reorders the
+    buckets between both ends, finding on the way whether it closes a cycle. The transitive
+    closure, bitsets packed in python ints of the items below (or above) a bucket, is only a
+    cache: computed on first query and then kept up to date by the adds that change it.
+    The accepted votes are also kept as item edges, to find the chain of votes a rejected one
+    contradicts.
+    """
+
+    def __init__(self):
+        self.__index_by_id = {}  # type: dict[int, int]
+        self.__id_by_index = []  # type: list[int]
+        self.__parent = []  # type: list[int]
+        # by bucket root: position in the topological order, smaller and bigger roots, and the items
+        # bitset of the buckets with several items (a single item bucket is the item)
+        self.__members = {}  # type: dict[int, int]
+        self.__position = []  # type: list[int]
+        self.__adjacent = (defaultdict(set), defaultdict(set))  # type: tuple[dict[int, set], dict[int, set]]
+        self.__next_position = 0
+        # closure cache by bucket root: items below (_DOWN) or above (_UP) it, members excluded
+        self.__reach = ({}, {})  # type: tuple[dict[int, int], dict[int, int]]
+        # items voted smaller than, or tied with, an item
+        self.__below = defaultdict(list)  # type: dict[int, list[int]]
+        self.__tied_with = defaultdict(list)  # type: dict[int, list[int]]
+        # votes of an item, to load the edges of a graph restored by from_state
+        self.__load_item_outcomes = None  # type: Optional[Callable]
+
+    @staticmethod
+    def from_outcomes(outcomes) -> Optional["VoteGraph"]:
+        """Graph of all the (item1_id, item2_id, bigger_id) votes at once, None if some of them contradict.
+
+        Faster than adding them one by one: buckets are ordered once, by their votes in any order.
+        """
+        graph = VoteGraph()
+        below = graph.__below
+        parent = graph.__parent
+        for item1_id, item2_id, bigger_id in outcomes:
+            item1 = graph.__get_index(item1_id)
+            item2 = graph.__get_index(item2_id)
+            if bigger_id is None:
+                root1 = graph.__find(item1)
+                root2 = graph.__find(item2)
+                if root1 != root2:
+                    parent[root2] = root1
+                    graph.__members[root1] = graph.__get_members(root1) | graph.__members.pop(root2, 1 << root2)
+                graph.__tied_with[item1].append(item2)
+                graph.__tied_with[item2].append(item1)
+            elif bigger_id == item1_id:
+                below[item1].append(item2)
+            else:
+                below[item2].append(item1)
+        lowers, uppers = graph.__adjacent
+        for bigger, smallers in below.items():
+            upper = graph.__find(bigger)
+            for smaller in smallers:
+                lower = graph.__find(smaller)
+                if upper == lower:
+                    return None
+                lowers[upper].add(lower)
+                uppers[lower].add(upper)
+        # Kahn's algorithm: buckets get their positions as soon as all the bigger ones have theirs
+        roots = [index for index in range(len(parent)) if parent[index] == index]
+        waiting = {root: len(uppers.get(root, ())) for root in roots}
+        ready = [root for root in roots if not waiting[root]]
+        position = 0
+        while ready:
+            root = ready.pop()
+            graph.__position[root] = position
+            position += 1
+            for lower in lowers.get(root, ()):
+                waiting[lower] -= 1
+                if not waiting[lower]:
+                    ready.append(lower)
+        return graph if position == len(roots) else None
+
+    @staticmethod
+    def from_state(state: tuple, load_item_outcomes: Callable) -> "VoteGraph":
+        """Graph of a get_state, without reading the votes until a bucket is searched.
+
+        load_item_outcomes(item_id) gives the (item1_id, item2_id, bigger_id) votes of an item: when
+        a bucket is first reached, the votes of its items in the order of the state are its edges,
+        the others are the rejected ones (or newer votes, added by add or add_tie).
+        """
+        item_ids, root_ids, positions = state
+        graph = VoteGraph()
+        for item_id in item_ids:
+            graph.__get_index(item_id)
+        index_by_id = graph.__index_by_id
+        tied_by_root = {}
+        for index, root_id in enumerate(root_ids):
+            root = index_by_id[root_id]
+            graph.__parent[index] = root
+            if root != index:
+                tied_by_root.setdefault(root, [root]).append(index)
+        for root, tied in tied_by_root.items():
+            members = 0
+            for index in tied:
+                members |= 1 << index
+            graph.__members[root] = members
+        graph.__position = list(positions)
+        graph.__next_position = max(positions, default=-1) + 1
+        graph.__load_item_outcomes = load_item_outcomes
+        graph.__adjacent = (_LazyAdjacency(graph.__load_bucket), _LazyAdjacency(graph.__load_bucket))
+        return graph
+
+    def get_state(self) -> tuple:
+        """(item ids, bucket root id of each item, position of each item bucket), see from_state."""
+        roots = [self.__find(index) for index in range(len(self.__parent))]
+        return list(self.__id_by_index), [self.__id_by_index[root] for root in roots], \
+            [self.__position[root] for root in roots]
+
+    def __load_bucket(self, root: int):
+        lowers = set()
+        uppers = set()
+        position = self.__position
+        members = self.__get_members(root)
+        while members:
+            member = (members & -members).bit_length() - 1
+            members &= members - 1
+            item_id = self.__id_by_index[member]
+            for item1_id, item2_id, bigger_id in self.__load_item_outcomes(item_id):
+                other = self.__index_by_id.get(item2_id if item1_id == item_id else item1_id)
+                if other is None:
+                    continue
+                other_root = self.__find(other)
+                if bigger_id is None:
+                    if other_root == root:
+                        self.__tied_with[member].append(other)
+                elif other_root == root:
+                    continue
+                elif bigger_id == item_id:
+                    # an accepted vote follows the order, a rejected one goes against it
+                    if position[root] < position[other_root]:
+                        lowers.add(other_root)
+                        self.__below[member].append(other)
+                elif position[other_root] < position[root]:
+                    uppers.add(other_root)
+        self.__adjacent[_DOWN][root] = lowers
+        self.__adjacent[_UP][root] = uppers
+
+    def __get_index(self, item_id: int) -> int:
+        index = self.__index_by_id.get(item_id)
+        if index is None:
+            index = len(self.__parent)
+            self.__index_by_id[item_id] = index
+            self.__id_by_index.append(item_id)
+            self.__parent.append(index)
+            self.__position.append(self.__next_position)
+            self.__next_position += 1
+        return index
+
+    def __get_members(self, root: int) -> int:
+        return self.__members.get(root, 1 << root)
+
+    def __find(self, index: int) -> int:
+        parent = self.__parent
+        root = index
+        while parent[root] != root:
+            root = parent[root]
+        while parent[index] != root:
+            parent[index], index = root, parent[index]
+        return root
+
+    def __get_reach(self, root: int, direction: int) -> int:
+        """Items below (or above) the bucket, computed once for it and the buckets it reaches."""
+        cache = self.__reach[direction]
+        if root in cache:
+            return cache[root]
+        adjacent = self.__adjacent[direction]
+        get_members = self.__get_members
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            pending = [other for other in adjacent[node] if other not in cache]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if node not in cache:
+                reach = 0
+                for other in adjacent[node]:
+                    reach |= get_members(other) | cache[other]
+                cache[node] = reach
+        return cache[root]
+
+    def __spread_reach(self, starts: list, direction: int, gain: int):
+        """Add gain to the cached reach of starts and of the buckets reaching them, the other way.
+
+        A bucket is only cached with all the buckets it reaches, so the buckets reaching one that
+        is not cached are not cached either.
+        """
+        cache = self.__reach[direction]
+        if not cache:
+            return
+        adjacent = self.__adjacent[1 - direction]
+        seen = set(starts)
+        stack = list(starts)
+        while stack:
+            node = stack.pop()
+            reach = cache.get(node)
+            if reach is None or reach & gain == gain:
+                # so do the buckets reaching it
+                continue
+            cache[node] = reach | gain
+            for other in adjacent[node]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+
+    def __search(self, start: int, direction: int, bound: int, target: int) -> Optional[list]:
+        """Buckets reached from start within bound of the topological order, None if target is one of them."""
+        position = self.__position
+        adjacent = self.__adjacent[direction]
+        found = [start]
+        seen = {start}
+        index = 0
+        while index < len(found):
+            for other in adjacent[found[index]]:
+                if other == target:
+                    return None
+                if other not in seen and (position[other] < bound if direction == _DOWN else position[other] > bound):
+                    seen.add(other)
+                    found.append(other)
+            index += 1
+        return found
+
+    def __insert_edge(self, upper: int, lower: int) -> bool:
+        """Add the bucket edge upper > lower reordering the buckets between them, False if it closes a cycle."""
+        position = self.__position
+        if position[upper] > position[lower]:
+            below = self.__search(lower, _DOWN, position[upper], upper)
+            if below is None:
+                return False
+            above = self.__search(upper, _UP, position[lower], lower)
+            # everything above upper goes before everything below lower, in the positions they held
+            moved = sorted(above, key=position.__getitem__) + sorted(below, key=position.__getitem__)
+            for root, new_position in zip(moved, sorted(position[root] for root in moved)):
+                position[root] = new_position
+        self.__adjacent[_DOWN][upper].add(lower)
+        self.__adjacent[_UP][lower].add(upper)
+        return True
+
+    def __reaches(self, upper: int, lower: int) -> bool:
+        if self.__position[upper] > self.__position[lower]:
+            return False
+        return self.__search(upper, _DOWN, self.__position[lower], lower) is None
+
+    def add(self, bigger_id: int, smaller_id: int) -> bool:
+        """Add bigger > smaller, returns False (and leaves the graph untouched) if it contradicts known votes."""
+        bigger = self.__get_index(bigger_id)
+        smaller = self.__get_index(smaller_id)
+        upper = self.__find(bigger)
+        lower = self.__find(smaller)
+        if upper == lower or not self.__insert_edge(upper, lower):
+            return False
+        self.__below[bigger].append(smaller)
+        if upper in self.__reach[_DOWN]:
+            self.__spread_reach([upper], _DOWN, self.__get_members(lower) | self.__get_reach(lower, _DOWN))
+        if lower in self.__reach[_UP]:
+            self.__spread_reach([lower], _UP, self.__get_members(upper) | self.__get_reach(upper, _UP))
+        return True
+
+    def __get_reach_if_cached(self, root: int, direction: int) -> int:
+        # only needed to update a non empty cache
+        return self.__get_reach(root, direction) if self.__reach[direction] else 0
+
+    def add_tie(self, item1_id: int, item2_id: int) -> bool:
+        """Merge the buckets of both items, returns False (graph untouched) if votes already order them."""
+        item1 = self.__get_index(item1_id)
+        item2 = self.__get_index(item2_id)
+        root1 = self.__find(item1)
+        root2 = self.__find(item2)
+        if root1 != root2:
+            if self.__reaches(root1, root2) or self.__reaches(root2, root1):
+                return False
+            self.__merge(root1, root2)
+        self.__tied_with[item1].append(item2)
+        self.__tied_with[item2].append(item1)
+        return True
+
+    def __merge(self, root1: int, root2: int):
+        adjacent = self.__adjacent
+        gains = [self.__get_reach_if_cached(root1, direction) | self.__get_reach_if_cached(root2, direction)
+                 for direction in (_DOWN, _UP)]
+        members = self.__get_members(root1) | self.__get_members(root2)
+        # the bucket with fewer edges joins the other one
+        if len(adjacent[_DOWN][root1]) + len(adjacent[_UP][root1]) < \
+                len(adjacent[_DOWN][root2]) + len(adjacent[_UP][root2]):
+            root1, root2 = root2, root1
+        # incomparable buckets: root1 takes the edges of root2 first, closing no cycle
+        for lower in list(adjacent[_DOWN][root2]):
+            self.__insert_edge(root1, lower)
+        for upper in list(adjacent[_UP][root2]):
+            self.__insert_edge(upper, root1)
+        for lower in adjacent[_DOWN][root2]:
+            adjacent[_UP][lower].discard(root2)
+        for upper in adjacent[_UP][root2]:
+            adjacent[_DOWN][upper].discard(root2)
+        del adjacent[_DOWN][root2], adjacent[_UP][root2]
+        self.__parent[root2] = root1
+        self.__members[root1] = members
+        self.__members.pop(root2, None)
+        for direction in (_DOWN, _UP):
+            cache = self.__reach[direction]
+            cache.pop(root2, None)
+            if cache:
+                cache[root1] = gains[direction]
+                self.__spread_reach(list(adjacent[1 - direction][root1]), direction, members | gains[direction])
+
+    def find_chain(self, upper_id: int, lower_id: int) -> list:
+        """Shortest chain of accepted votes from upper down to lower, as (item1_id, item2_id) pairs.
+
+        Each vote of the chain is upper > lower or a tie, [] if votes do not imply upper >= lower.
+        Only the items of the buckets between both in the topological order are searched.
+        """
+        upper = self.__index_by_id.get(upper_id)
+        lower = self.__index_by_id.get(lower_id)
+        if upper is None or lower is None or upper == lower:
+            return []
+        position = self.__position
+        first = position[self.__find(upper)]
+        last = position[self.__find(lower)]
+        parent = {upper: upper}
+        frontier = [upper]
+        while frontier and lower not in parent:
+            next_frontier = []
+            for index in frontier:
+                # loads the item edges of a restored graph
+                self.__adjacent[_DOWN][self.__find(index)]
+                for other in self.__below.get(index, []) + self.__tied_with.get(index, []):
+                    if other not in parent and first <= position[self.__find(other)] <= last:
+                        parent[other] = index
+                        next_frontier.append(other)
+            frontier = next_frontier
+        if lower not in parent:
+            return []
+        chain = []
+        index = lower
+        while index != upper:
+            chain.append((self.__id_by_index[parent[index]], self.__id_by_index[index]))
+            index = parent[index]
+        chain.reverse()
+        return chain
+
+    def get_indexes(self, item_ids: list) -> list:
+        """Dense index of every item id, registering the ones without votes yet."""
+        index_by_id = self.__index_by_id
+        return [index_by_id[item_id] if item_id in index_by_id else self.__get_index(item_id) for item_id in item_ids]
+
+    def get_bitsets(self, item_id: int) -> tuple:
+        """(bigger, smaller, tied) bitsets of an item, bit i set for the item with dense index i."""
+        root = self.__find(self.__get_index(item_id))
+        return self.__get_reach(root, _UP), self.__get_reach(root, _DOWN), self.__get_members(root)
+
+    def compare_ids(self, item1_id: int, item2_id: int) -> Optional[int]:
+        """1 if votes imply item1 > item2, -1 if item1 < item2, 0 if both are in the same bucket, None if unknown."""
+        item1 = self.__index_by_id.get(item1_id)
+        item2 = self.__index_by_id.get(item2_id)
+        if item1 is None or item2 is None:
+            return None
+        root1 = self.__find(item1)
+        root2 = self.__find(item2)
+        if root1 == root2:
+            return 0
+        # only the bucket first in the topological order can be the bigger one
+        if self.__position[root1] < self.__position[root2]:
+            upper, lower, sign = root1, item2, 1
+        else:
+            upper, lower, sign = root2, item1, -1
+        if not self.__adjacent[_DOWN][upper] or not self.__adjacent[_UP][self.__find(lower)]:
+            return None
+        return sign if self.__get_reach(upper, _DOWN) >> lower & 1 else None
+
+    def __len__(self):
+        return len(self.__parent)
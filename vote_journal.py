@@ -0,0 +1,90 @@
+import csv
+import logging
+import os
+import threading
+from typing import Optional
+
+from background_writer import BackgroundWriter
+from typechecking import typechecked
+from vote import ItemPairVote
+from votes import VotesCache
+
+
+@typechecked
+class VoteJournal:
+    """Append only votes csv: each vote is one row, flushed (and fsynced if sync) before append returns.
+
+    The file keeps the votes csv format so VotesCache.load_from_csv replays it on startup. With a
+    background writer, append returns once the rows are queued, and the rows queued meanwhile are
+    written with a single flush (and fsync): only the votes of the last moments before a crash can
+    be lost, a normal exit or a signal flushes them.
+    """
+
+    def __init__(self, filename: str, sync: bool = True, background_writer: Optional[BackgroundWriter] = None):
+        self.__filename = filename
+        self.__sync = sync
+        self.__background_writer = background_writer
+        self.__file = None
+        self.__writer = None
+        self.__queued_rows = []  # type: list[dict]
+        self.__queue_lock = threading.Lock()
+
+    def get_filename(self):
+        return self.__filename
+
+    def __open(self):
+        size = os.path.getsize(self.__filename) if os.path.exists(self.__filename) else 0
+        if size > 0:
+            with open(self.__filename, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                ends_with_newline = file.read(1) == b'\n'
+        self.__file = open(self.__filename, mode='a', encoding='utf-8-sig', newline='')
+        self.__writer = csv.DictWriter(self.__file, fieldnames=ItemPairVote.CsvFieldNames.csv_headers)
+        if size == 0:
+            self.__writer.writeheader()
+        elif not ends_with_newline:
+            # previous run died in the middle of a row: load_from_csv skips it, keep new rows apart
+            logging.warning("{} ends with an incomplete row".format(self.__filename))
+            self.__file.write("\r\n")
+
+    def append(self, vote: ItemPairVote):
+        self.append_all([vote])
+
+    def append_all(self, votes: list):
+        """Append many votes with a single flush (and fsync)."""
+        rows = [vote.build_dict_for_csv() for vote in votes]
+        if self.__background_writer is None:
+            self.__write_rows(rows)
+            return
+        with self.__queue_lock:
+            self.__queued_rows.extend(rows)
+        self.__background_writer.submit(self.__filename, self.__write_queued_rows)
+
+    def __write_queued_rows(self):
+        with self.__queue_lock:
+            rows, self.__queued_rows = self.__queued_rows, []
+        self.__write_rows(rows)
+
+    def __write_rows(self, rows: list):
+        if self.__file is None:
+            self.__open()
+        self.__writer.writerows(rows)
+        self.__file.flush()
+        if self.__sync:
+            os.fsync(self.__file.fileno())
+
+    def compact(self, votes: VotesCache):
+        """Rewrite the journal with one row per vote in votes, atomically replacing the old file."""
+        self.close()
+        temp_filename = self.__filename + ".tmp"
+        votes.save_to_csv_file(temp_filename)
+        os.replace(temp_filename, self.__filename)
+        logging.debug("{} compacted to {} votes".format(self.__filename, len(votes)))
+
+    def close(self):
+        if self.__background_writer is not None:
+            self.__background_writer.flush()
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+            self.__writer = None
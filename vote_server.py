@@ -0,0 +1,338 @@
+"""Local HTTP server letting several voters answer the questions of one list at the same time.
+
+Run as `python vote_server.py items.csv --port 8000` and open http://localhost:8000/ in one
+browser per voter. Several items are inserted into the sorted list at once (lanes), each by its
+own binary search, so there is one pending question per lane and every voter gets a different
+one. Answers go through UserVoteUiMaker into the shared votes and the votes csv, like terminal
+answers, and the sorted list is written to items.csv.out.csv after every insertion, in the
+background so the event loop does not wait on disk.
+
+API (JSON):
+
+* GET /question?voter=NAME: a pending question not held by another voter, 204 if there is none
+  within a few seconds, 410 once the list is sorted
+* POST /answer?voter=NAME {"id": question id, "choice": "1", "2" or "n"}: 409 if the question is
+  not pending anymore (answered by another voter after its lease expired)
+* GET /status: counters of the session
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import urllib.parse
+from typing import Callable, Optional
+
+from item import ItemWrapper
+from items import Items
+from sort_items import enrich_and_write_csv
+from typechecking import typechecked
+from user_questions import UserVoteUiMaker
+
+_VOTE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Which one rates higher?</title></head>
+<body>
+<p id="question">waiting for a question...</p>
+<button onclick="answer('1')">1</button> <button onclick="answer('2')">2</button>
+<button onclick="answer('n')">cannot say</button>
+<script>
+const voter = Math.random().toString(36).slice(2);
+let question = null;
+async function next() {
+  const response = await fetch("/question?voter=" + encodeURIComponent(voter));
+  if (response.status === 410) { document.getElementById("question").textContent = "list sorted, thanks!"; return; }
+  if (response.status !== 200) { return next(); }
+  question = await response.json();
+  document.getElementById("question").textContent =
+    "1: " + question.item1.description + "  vs  2: " + question.item2.description;
+}
+async function answer(choice) {
+  if (question === null) { return; }
+  await fetch("/answer?voter=" + encodeURIComponent(voter),
+              {method: "POST", body: JSON.stringify({id: question.id, choice: choice})});
+  question = null;
+  next();
+}
+next();
+</script>
+</body></html>
+"""
+
+_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 409: "Conflict", 410: "Gone"}
+
+
+@typechecked
+class ServedQuestion:
+    def __init__(self, question_id: int, item1: ItemWrapper, item2: ItemWrapper, future: asyncio.Future):
+        self.__id = question_id
+        self.__item1 = item1
+        self.__item2 = item2
+        self.__future = future
+        self.__voter = None  # type: Optional[str]
+        self.__assigned_at = 0.0
+
+    def get_id(self):
+        return self.__id
+
+    def get_items(self):
+        return self.__item1, self.__item2
+
+    def get_future(self) -> asyncio.Future:
+        return self.__future
+
+    def get_voter(self) -> Optional[str]:
+        return self.__voter
+
+    def is_free(self, now: float, lease_seconds: float) -> bool:
+        """Not held by a voter, or held longer than lease_seconds without an answer."""
+        return self.__voter is None or now - self.__assigned_at > lease_seconds
+
+    def assign(self, voter: str, now: float):
+        self.__voter = voter
+        self.__assigned_at = now
+
+    def build_dict_for_json(self):
+        return {"id": self.__id,
+                "item1": {"id": self.__item1.get_id(), "description": self.__item1.format_description()},
+                "item2": {"id": self.__item2.get_id(), "description": self.__item2.format_description()}}
+
+
+@typechecked
+class VoteServer:
+    """Sorts items by inserting up to lanes items at once, asking the missing votes to HTTP voters.
+
+    Everything runs in one event loop: answers are merged into the votes under a lock, and a
+    lane waiting for its answer lets the other lanes go on.
+    """
+
+    def __init__(self, items: Items, user_vote_ui_maker: UserVoteUiMaker, sorted_filename: str, lanes: int = 4,
+                 lease_seconds: float = 300.0, poll_seconds: float = 5.0):
+        self.__items = items
+        self.__user_vote_ui_maker = user_vote_ui_maker
+        self.__sorted_list = Items(sorted_filename, load_csv=False)
+        # index of every item of the sorted list by item id
+        self.__position_by_id = {}  # type: dict[int, int]
+        self.__lanes = lanes
+        self.__lease_seconds = lease_seconds
+        self.__poll_seconds = poll_seconds
+        self.__pending = {}  # type: dict[int, ServedQuestion]
+        self.__question_ids = itertools.count(1)
+        self.__answer_count_by_voter = {}  # type: dict[str, int]
+        self.__question_count = 0
+        self.__done = False
+        self.__server = None
+        self.__sort_task = None
+        # created in start(), inside the event loop
+        self.__changed = None
+        self.__vote_lock = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        """Start serving and sorting, port 0 picks a free port (see get_port)."""
+        self.__changed = asyncio.Condition()
+        self.__vote_lock = asyncio.Lock()
+        self.__server = await asyncio.start_server(self.__handle, host, port)
+        self.__sort_task = asyncio.ensure_future(self.__sort())
+        logging.info("serving votes on http://{}:{}/".format(host, self.get_port()))
+
+    def get_port(self) -> int:
+        return self.__server.sockets[0].getsockname()[1]
+
+    async def wait_sorted(self) -> Items:
+        """Wait until every item is inserted, then stop serving and return the sorted list."""
+        try:
+            await self.__sort_task
+        finally:
+            self.__server.close()
+            await self.__server.wait_closed()
+        return self.__sorted_list
+
+    async def run(self, host: str = "127.0.0.1", port: int = 0) -> Items:
+        await self.start(host, port)
+        return await self.wait_sorted()
+
+    def get_status(self) -> dict:
+        return {"items": len(self.__items.get_wrapped_items()),
+                "sorted": len(self.__sorted_list.get_items()),
+                "pending_questions": len(self.__pending),
+                "questions": self.__question_count,
+                "answers_by_voter": dict(self.__answer_count_by_voter),
+                "done": self.__done}
+
+    async def __sort(self):
+        # same order as SortStrategy.PrioritizeCertainty: items with more certain votes first
+        queue = self.__user_vote_ui_maker.get_items_sorted_by_certainty()
+        queue.reverse()
+        queue = iter(queue)
+
+        async def lane():
+            for next_item in queue:
+                await self.__insert(next_item)
+
+        await asyncio.gather(*(lane() for _ in range(self.__lanes)))
+        enrich_and_write_csv(self.__sorted_list, self.__user_vote_ui_maker.get_votes(),
+                              self.__user_vote_ui_maker.get_writer())
+        async with self.__changed:
+            self.__done = True
+            self.__changed.notify_all()
+
+    async def __insert(self, item: ItemWrapper):
+        # bounds are kept as items, indexes shift when other lanes insert while this one waits for an answer
+        lower = upper = None
+        items = self.__sorted_list.get_items()
+        position_by_id = self.__position_by_id
+        while True:
+            lo = 0 if lower is None else position_by_id[lower.get_id()] + 1
+            hi = len(items) if upper is None else position_by_id[upper.get_id()]
+            if lo >= hi:
+                index = lo
+                break
+            other = items[(lo + hi) // 2]
+            ret = await self.__compare(item, other)
+            if ret == 0:
+                # same bucket: right after it, like bisect_fork.bisect_right_cmp
+                index = position_by_id[other.get_id()] + 1
+                break
+            if ret < 0:
+                upper = other
+            else:
+                lower = other
+        items.insert(index, item)
+        position_by_id.update((other.get_id(), position) for position, other in enumerate(items[index:], index))
+        self.__sorted_list.write_csv(self.__user_vote_ui_maker.get_writer())
+
+    async def __compare(self, item1: ItemWrapper, item2: ItemWrapper) -> int:
+        known = self.__user_vote_ui_maker.get_known_cmp(item1, item2)
+        if known is not None:
+            return known
+        question = ServedQuestion(next(self.__question_ids), item1, item2, asyncio.get_running_loop().create_future())
+        self.__question_count += 1
+        async with self.__changed:
+            self.__pending[question.get_id()] = question
+            self.__changed.notify_all()
+        return await question.get_future()
+
+    async def next_question(self, voter: str) -> Optional[ServedQuestion]:
+        """Question held by voter or else the oldest free one, waiting up to poll_seconds.
+
+        None if there is none or the list is sorted.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.__poll_seconds
+        async with self.__changed:
+            while not self.__done:
+                now = loop.time()
+                held = [question for question in self.__pending.values() if question.get_voter() == voter]
+                free = [question for question in self.__pending.values() if question.is_free(now, self.__lease_seconds)]
+                for question in held + free:
+                    question.assign(voter, now)
+                    return question
+                remaining = deadline - now
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self.__changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        return None
+
+    async def answer(self, question_id: int, choice: str, voter: str) -> bool:
+        """Merge an answer into the votes, False if the question is not pending anymore."""
+        if choice not in ("1", "2", "n"):
+            raise ValueError(f"bad answer {choice}")
+        async with self.__vote_lock:
+            question = self.__pending.pop(question_id, None)
+            if question is None:
+                return False
+            item1, item2 = question.get_items()
+            bigger = item1 if choice == "1" else item2 if choice == "2" else None
+            ret = self.__user_vote_ui_maker.record_vote(item1, item2, bigger)
+            self.__answer_count_by_voter[voter] = self.__answer_count_by_voter.get(voter, 0) + 1
+            question.get_future().set_result(ret)
+        return True
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                content_length = int(headers.get("content-length", 0))
+            except ValueError:
+                content_length = -1
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "bad request line"}
+            elif content_length < 0:
+                status, payload = 400, {"error": "bad content-length {}".format(headers["content-length"])}
+            else:
+                body = await reader.readexactly(content_length)
+                status, payload = await self.__route(request_line[0], request_line[1], body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        if isinstance(payload, str):
+            content, content_type = payload.encode("utf-8"), "text/html; charset=utf-8"
+        elif payload is None:
+            content, content_type = b"", "application/json"
+        else:
+            content, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(content)}\r\nConnection: close\r\n\r\n".encode("latin-1") + content)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def __route(self, method: str, target: str, body: bytes):
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        voter = query.get("voter", ["anonymous"])[0]
+        if method == "GET" and url.path == "/":
+            return 200, _VOTE_PAGE
+        if method == "GET" and url.path == "/status":
+            return 200, self.get_status()
+        if method == "GET" and url.path == "/question":
+            question = await self.next_question(voter)
+            if question is not None:
+                return 200, question.build_dict_for_json()
+            return (410, {"done": True}) if self.__done else (204, None)
+        if method == "POST" and url.path == "/answer":
+            try:
+                request = json.loads(body)
+                accepted = await self.answer(int(request["id"]), str(request["choice"]), voter)
+            except (ValueError, KeyError, TypeError) as error:
+                return 400, {"error": str(error)}
+            return (200, {"accepted": True}) if accepted else (409, {"accepted": False})
+        return 404, {"error": f"no {method} {url.path}"}
+
+
+@typechecked
+def serve_items_from_csv(filename: str, host: str = "127.0.0.1", port: int = 8000, lanes: int = 4,
+                         vote_store_factory: Optional[Callable] = None) -> Items:
+    items = Items(filename)
+    vote_store = None if vote_store_factory is None else vote_store_factory(items)
+    user_vote_ui_maker = UserVoteUiMaker(filename + ".votes", items, vote_store=vote_store)
+    try:
+        return asyncio.run(VoteServer(items, user_vote_ui_maker, filename + ".out.csv", lanes).run(host, port))
+    finally:
+        user_vote_ui_maker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("filename", nargs="?", default="items.csv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--lanes", type=int, default=4, help="items inserted at once, about the number of voters")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve_items_from_csv(args.filename, args.host, args.port, args.lanes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Simulated voters for vote_server.py, talking HTTP to a local server with no other service.
+
+Run as `python vote_server_simulation.py --size 200 --voters 4`: synthetic items are sorted by
+several concurrent clients that answer from a hidden order (with an optional fraction of random
+answers and think time), and the session is checked and reported like benchmark_strategies.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmark_strategies import kendall_tau, write_synthetic_items_csv
+
+
+async def _request(port: int, method: str, path: str, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode("latin-1") + body)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(content) if content else None
+
+
+async def _simulated_voter(port: int, name: str, hidden_rank: dict, noise: float, think_seconds: float):
+    answers = 0
+    while True:
+        status, question = await _request(port, "GET", f"/question?voter={name}")
+        if status == 410:
+            return answers
+        if status != 200:
+            continue
+        await asyncio.sleep(random.uniform(0, 2 * think_seconds))
+        rank1 = hidden_rank[question["item1"]["id"]]
+        rank2 = hidden_rank[question["item2"]["id"]]
+        choice = "1" if rank1 > rank2 else "2"
+        if random.random() < noise:
+            choice = random.choice(("1", "2"))
+        status, _ = await _request(port, "POST", f"/answer?voter={name}", {"id": question["id"], "choice": choice})
+        if status == 200:
+            answers += 1
+
+
+def run_simulation(size: int, voter_count: int, lanes: int, noise: float = 0.0, think_seconds: float = 0.0,
+                   seed: int = 0) -> dict:
+    from items import Items
+    from user_questions import UserVoteUiMaker
+    from vote_server import VoteServer
+
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        items_filename = os.path.join(directory, "items.csv")
+        write_synthetic_items_csv(items_filename, size)
+        hidden_order = list(range(1, size + 1))
+        random.shuffle(hidden_order)
+        hidden_rank = {item_id: rank for rank, item_id in enumerate(hidden_order)}
+        items = Items(items_filename)
+        user_vote_ui_maker = UserVoteUiMaker(items_filename + ".votes", items, sync_votes=False)
+        server = VoteServer(items, user_vote_ui_maker, items_filename + ".out.csv", lanes)
+
+        async def session():
+            await server.start()
+            voters = [_simulated_voter(server.get_port(), f"voter{number}", hidden_rank, noise, think_seconds)
+                      for number in range(voter_count)]
+            answers = await asyncio.gather(*voters)
+            return await server.wait_sorted(), answers
+
+        start = time.perf_counter()
+        sorted_list, answers = asyncio.run(session())
+        elapsed = time.perf_counter() - start
+        user_vote_ui_maker.close()
+        status = server.get_status()
+    return {
+        "size": size,
+        "voters": voter_count,
+        "lanes": lanes,
+        "noise": noise,
+        "questions": status["questions"],
+        "answers_by_voter": answers,
+        "seconds": elapsed,
+        "kendall_tau": kendall_tau([hidden_rank[item.get_id()] for item in sorted_list.get_items()]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--voters", type=int, default=4)
+    parser.add_argument("--lanes", type=int, default=None, help="items inserted at once, --voters by default")
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of random answers")
+    parser.add_argument("--think-seconds", type=float, default=0.0, help="mean answer delay of each voter")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    lanes = args.voters if args.lanes is None else args.lanes
+    print(json.dumps(run_simulation(args.size, args.voters, lanes, args.noise, args.think_seconds, args.seed),
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
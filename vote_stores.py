@@ -0,0 +1,831 @@
+import contextlib
+import itertools
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+from typing import Optional
+
+from item import ItemWrapper
+from items import Items
+from typechecking import typechecked
+from vote import ItemPairVote
+from vote import build_pair_key
+
+
+@typechecked
+class VoteStore:
+    """Storage of the votes of a VotesCache, at most one vote per pair of item ids.
+
+    Besides the votes it answers the per item vote counts and the votes contradicting a list
+    order, so stores can answer them without going through every vote.
+    """
+
+    def add(self, vote: ItemPairVote):
+        """Add a vote for a pair without one (VotesCache checks it first)."""
+        raise NotImplementedError()
+
+    def update(self, vote: ItemPairVote):
+        """Replace the vote of a pair that has one, a re-vote (VotesCache checks it first)."""
+        raise NotImplementedError()
+
+    def get(self, item1_id: int, item2_id: int) -> Optional[ItemPairVote]:
+        raise NotImplementedError()
+
+    def contains(self, item1_id: int, item2_id: int) -> bool:
+        raise NotImplementedError()
+
+    def get_item_votes(self, item_id: int) -> list:
+        raise NotImplementedError()
+
+    def get_item_vote_counts(self, item_id: int) -> tuple:
+        """(certain, uncertain) vote count of the item."""
+        raise NotImplementedError()
+
+    def iter_votes(self):
+        raise NotImplementedError()
+
+    def iter_outcomes(self):
+        """(item1 id, item2 id, bigger id or None) of every vote, without building ItemPairVote objects."""
+        for vote in self.iter_votes():
+            bigger = vote.get_bigger()
+            yield vote.get_item_1().get_id(), vote.get_item_2().get_id(), None if bigger is None else bigger.get_id()
+
+    def iter_item_outcomes(self, item_id: int):
+        """iter_outcomes of the votes of an item."""
+        for vote in self.get_item_votes(item_id):
+            bigger = vote.get_bigger()
+            yield vote.get_item_1().get_id(), vote.get_item_2().get_id(), None if bigger is None else bigger.get_id()
+
+    def get_graph_state(self) -> Optional[tuple]:
+        """VotesCache.get_graph_state saved with the votes, None if the store keeps none."""
+        return None
+
+    def save_graph_state(self, graph_state: tuple):
+        """Keep a VotesCache.get_graph_state of the current votes, for stores that persist it."""
+        pass
+
+    def find_votes_not_matching_positions(self, position_by_id: dict) -> list:
+        """Votes contradicting a list, position_by_id maps item ids to their index in the ascending list."""
+        return [vote for vote in self.iter_votes() if not vote.matches_positions(position_by_id)]
+
+    def transaction(self):
+        """Context grouping many adds, e.g. a csv replay, for stores that pay per write."""
+        return contextlib.nullcontext()
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        raise NotImplementedError()
+
+
+@typechecked
+class DictVoteStore(VoteStore):
+    """Votes as ItemPairVote objects in a dict, plus the list of votes of every item."""
+
+    def __init__(self):
+        # keyed by build_pair_key of both item ids
+        self.__votes = {}  # type: dict[int, ItemPairVote]
+        self.__votes_by_item_id = {}  # type: dict[int, list[ItemPairVote]]
+        self.__certainty_by_item_id = {}  # type: dict[int, int]
+        self.__uncertainty_by_item_id = {}  # type: dict[int, int]
+
+    def add(self, vote: ItemPairVote):
+        self.__votes[vote.get_key()] = vote
+        counters = self.__certainty_by_item_id if vote.is_certain() else self.__uncertainty_by_item_id
+        for item_id in (vote.get_item_1().get_id(), vote.get_item_2().get_id()):
+            self.__votes_by_item_id.setdefault(item_id, []).append(vote)
+            counters[item_id] = counters.get(item_id, 0) + 1
+
+    def update(self, vote: ItemPairVote):
+        previous = self.__votes[vote.get_key()]
+        self.__votes[vote.get_key()] = vote
+        previous_counters = self.__certainty_by_item_id if previous.is_certain() else self.__uncertainty_by_item_id
+        counters = self.__certainty_by_item_id if vote.is_certain() else self.__uncertainty_by_item_id
+        for item_id in (vote.get_item_1().get_id(), vote.get_item_2().get_id()):
+            item_votes = self.__votes_by_item_id[item_id]
+            item_votes[next(index for index, item_vote in enumerate(item_votes) if item_vote is previous)] = vote
+            previous_counters[item_id] -= 1
+            counters[item_id] = counters.get(item_id, 0) + 1
+
+    def get(self, item1_id: int, item2_id: int) -> Optional[ItemPairVote]:
+        return self.__votes.get(build_pair_key(item1_id, item2_id))
+
+    def contains(self, item1_id: int, item2_id: int) -> bool:
+        return build_pair_key(item1_id, item2_id) in self.__votes
+
+    def get_item_votes(self, item_id: int) -> list:
+        return self.__votes_by_item_id.get(item_id, [])
+
+    def get_item_vote_counts(self, item_id: int) -> tuple:
+        return self.__certainty_by_item_id.get(item_id, 0), self.__uncertainty_by_item_id.get(item_id, 0)
+
+    def iter_votes(self):
+        return iter(self.__votes.values())
+
+    def __len__(self):
+        return len(self.__votes)
+
+
+_EMPTY_SLOT = -1
+# 2^64 / golden ratio, spreads the packed pair keys over the table (fibonacci hashing)
+_HASH_MULTIPLIER = 11400714819323198485
+_OUTCOME_UNDECIDED = 0
+_OUTCOME_ITEM_1 = 1
+_OUTCOME_ITEM_2 = 2
+
+
+def _get_row_outcome(vote: ItemPairVote, item1_id: int) -> int:
+    """Outcome of the vote for a row whose first item is item1_id, whatever the item order of the vote."""
+    bigger = vote.get_bigger()
+    if bigger is None:
+        return _OUTCOME_UNDECIDED
+    return _OUTCOME_ITEM_1 if bigger.get_id() == item1_id else _OUTCOME_ITEM_2
+
+
+def _find_rows_not_matching(item1, item2, outcome, position_by_index: list) -> list:
+    """Rows of the vote columns whose bigger item comes no later than the smaller one, by item index."""
+    rows = []
+    for row, (index1, index2, row_outcome) in enumerate(zip(item1, item2, outcome)):
+        if row_outcome == _OUTCOME_UNDECIDED:
+            continue
+        bigger, smaller = (index1, index2) if row_outcome == _OUTCOME_ITEM_1 else (index2, index1)
+        bigger_position = position_by_index[bigger]
+        smaller_position = position_by_index[smaller]
+        if bigger_position is not None and smaller_position is not None and bigger_position <= smaller_position:
+            rows.append(row)
+    return rows
+
+
+def _build_not_matching(build_vote, rows, item_count: int) -> list:
+    """Votes of the rows not matching a list of item_count items, each logged as matches_positions does."""
+    not_matching = [build_vote(row) for row in rows]
+    for vote in not_matching:
+        vote.log_not_matching(item_count)
+    return not_matching
+
+
+@typechecked
+class ArrayVoteStore(VoteStore):
+    """Votes of a VotesCache packed in arrays, for very large vote sets.
+
+    Every vote is one row of parallel arrays: int32 dense indexes of both items, an int8 outcome
+    and a float64 timestamp. Pairs are found through an open addressing hash table (linear
+    probing) holding only row numbers, and every item keeps an int32 array of its rows and its
+    vote counts. ItemPairVote objects are only built when a vote is read.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.__index_by_id = {}  # type: dict[int, int]
+        self.__items = []  # type: list[ItemWrapper]
+        self.__rows_by_item = []  # type: list[array]
+        self.__certain_count = array('i')
+        self.__uncertain_count = array('i')
+        self.__item1 = array('i')
+        self.__item2 = array('i')
+        self.__outcome = array('b')
+        self.__timestamp = array('d')
+        self.__allocate_table(max(capacity, 8))
+
+    def __allocate_table(self, capacity: int):
+        # power of two capacity, the top bits of the multiplied key are the slot
+        self.__shift = 64 - (capacity - 1).bit_length()
+        self.__mask = (1 << (64 - self.__shift)) - 1
+        self.__table = array('i', [_EMPTY_SLOT]) * (self.__mask + 1)
+
+    def __find_slot(self, item1, item2):
+        """Slot of the row of the pair of item indexes, or the empty slot where it would go."""
+        table = self.__table
+        rows_item1 = self.__item1
+        rows_item2 = self.__item2
+        key = (min(item1, item2) << 32) | max(item1, item2)
+        slot = ((key * _HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.__shift
+        while True:
+            row = table[slot]
+            if row == _EMPTY_SLOT:
+                return slot
+            if (rows_item1[row] == item1 and rows_item2[row] == item2) or \
+                    (rows_item1[row] == item2 and rows_item2[row] == item1):
+                return slot
+            slot = (slot + 1) & self.__mask
+
+    def __get_row(self, item1_id, item2_id):
+        item1 = self.__index_by_id.get(item1_id)
+        item2 = self.__index_by_id.get(item2_id)
+        if item1 is None or item2 is None:
+            return None
+        row = self.__table[self.__find_slot(item1, item2)]
+        return None if row == _EMPTY_SLOT else row
+
+    def __get_item_index(self, item: ItemWrapper) -> int:
+        index = self.__index_by_id.get(item.get_id())
+        if index is None:
+            index = len(self.__items)
+            self.__index_by_id[item.get_id()] = index
+            self.__items.append(item)
+            self.__rows_by_item.append(array('i'))
+            self.__certain_count.append(0)
+            self.__uncertain_count.append(0)
+        return index
+
+    def __build_vote(self, row):
+        item1 = self.__items[self.__item1[row]]
+        item2 = self.__items[self.__item2[row]]
+        outcome = self.__outcome[row]
+        choice = item1 if outcome == _OUTCOME_ITEM_1 else item2 if outcome == _OUTCOME_ITEM_2 else None
+        return ItemPairVote(item1, item2, choice, self.__timestamp[row])
+
+    def add(self, vote: ItemPairVote):
+        item1 = self.__get_item_index(vote.get_item_1())
+        item2 = self.__get_item_index(vote.get_item_2())
+        row = len(self.__item1)
+        choice = vote.get_choice()
+        self.__item1.append(item1)
+        self.__item2.append(item2)
+        self.__outcome.append(_OUTCOME_UNDECIDED if choice is None else
+                              _OUTCOME_ITEM_1 if choice is vote.get_item_1() else _OUTCOME_ITEM_2)
+        self.__timestamp.append(vote.get_timestamp())
+        self.__rows_by_item[item1].append(row)
+        self.__rows_by_item[item2].append(row)
+        counts = self.__uncertain_count if choice is None else self.__certain_count
+        counts[item1] += 1
+        counts[item2] += 1
+        if 4 * (row + 1) > 3 * len(self.__table):
+            # keep the load factor under 3/4
+            self.__allocate_table(2 * len(self.__table))
+            rows = range(row + 1)
+        else:
+            rows = (row,)
+        for row in rows:
+            self.__table[self.__find_slot(self.__item1[row], self.__item2[row])] = row
+
+    def update(self, vote: ItemPairVote):
+        row = self.__get_row(vote.get_item_1().get_id(), vote.get_item_2().get_id())
+        outcome = _get_row_outcome(vote, self.__items[self.__item1[row]].get_id())
+        if (outcome == _OUTCOME_UNDECIDED) != (self.__outcome[row] == _OUTCOME_UNDECIDED):
+            previous_counts, counts = (self.__uncertain_count, self.__certain_count) if outcome else \
+                (self.__certain_count, self.__uncertain_count)
+            for item in (self.__item1[row], self.__item2[row]):
+                previous_counts[item] -= 1
+                counts[item] += 1
+        self.__outcome[row] = outcome
+        self.__timestamp[row] = vote.get_timestamp()
+
+    def get(self, item1_id: int, item2_id: int) -> Optional[ItemPairVote]:
+        row = self.__get_row(item1_id, item2_id)
+        return None if row is None else self.__build_vote(row)
+
+    def contains(self, item1_id: int, item2_id: int) -> bool:
+        return self.__get_row(item1_id, item2_id) is not None
+
+    def get_item_votes(self, item_id: int) -> list:
+        index = self.__index_by_id.get(item_id)
+        if index is None:
+            return []
+        return [self.__build_vote(row) for row in self.__rows_by_item[index]]
+
+    def get_item_vote_counts(self, item_id: int) -> tuple:
+        index = self.__index_by_id.get(item_id)
+        if index is None:
+            return 0, 0
+        return self.__certain_count[index], self.__uncertain_count[index]
+
+    def iter_votes(self):
+        return (self.__build_vote(row) for row in range(len(self.__item1)))
+
+    def iter_outcomes(self):
+        items = self.__items
+        for item1, item2, outcome in zip(self.__item1, self.__item2, self.__outcome):
+            item1_id = items[item1].get_id()
+            item2_id = items[item2].get_id()
+            yield item1_id, item2_id, item1_id if outcome == _OUTCOME_ITEM_1 else item2_id if outcome else None
+
+    def find_votes_not_matching_positions(self, position_by_id: dict) -> list:
+        # positions by dense index, only the contradicting rows become ItemPairVote objects
+        position_by_index = [position_by_id.get(item.get_id()) for item in self.__items]
+        rows = _find_rows_not_matching(self.__item1, self.__item2, self.__outcome, position_by_index)
+        return _build_not_matching(self.__build_vote, rows, len(position_by_id))
+
+    def __len__(self):
+        return len(self.__item1)
+
+
+@typechecked
+class SqliteVoteStore(VoteStore):
+    """Votes in an on disk SQLite database, so large vote sets open without reading every vote.
+
+    Pairs are looked up through the unique (item_low, item_high) index, the votes of an item
+    through it and the item_high index, and conflicts with a list are found by joining the votes
+    with a temporary table of positions. The vote graph state (tie bucket and topological position
+    of every item, and the rejected votes) is saved in the vote_graph tables, with the vote count
+    it is valid for, so the graph opens reading the votes of the buckets it searches only.
+    The database runs in WAL mode: every add outside
+    transaction() is a single cheap commit, fsynced unless sync is False. Items resolves the
+    stored ids to ItemWrapper objects: votes on items missing from it (removed from its csv) stay
+    in the database for when they come back, but are skipped when reading votes.
+    """
+
+    def __init__(self, filename: str, items: Items, sync: bool = True):
+        self.__items = items
+        self.__filename = filename
+        # autocommit, transaction() opens explicit transactions
+        self.__connection = sqlite3.connect(filename, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous={}".format("FULL" if sync else "NORMAL"))
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS votes (item_low INTEGER NOT NULL, item_high INTEGER NOT NULL, "
+            "item1_id INTEGER NOT NULL, item2_id INTEGER NOT NULL, bigger_id INTEGER, timestamp REAL NOT NULL)")
+        # the pair index also serves lookups by item_low
+        self.__connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS votes_pair ON votes (item_low, item_high)")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS votes_item_high ON votes (item_high)")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS vote_graph "
+            "(item_id INTEGER PRIMARY KEY, root_id INTEGER NOT NULL, position INTEGER NOT NULL)")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS vote_graph_rejected "
+            "(item_low INTEGER NOT NULL, item_high INTEGER NOT NULL, PRIMARY KEY (item_low, item_high))")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS vote_graph_info (vote_count INTEGER NOT NULL)")
+        self.__count = self.__connection.execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+
+    def get_filename(self):
+        return self.__filename
+
+    def __has_items(self, row) -> bool:
+        return self.__items.find_item_by_id(row[0]) is not None and self.__items.find_item_by_id(row[1]) is not None
+
+    def __build_vote(self, row):
+        item1_id, item2_id, bigger_id, timestamp = row
+        item1 = self.__items.get_item_by_id(item1_id)
+        item2 = self.__items.get_item_by_id(item2_id)
+        choice = None if bigger_id is None else item1 if bigger_id == item1_id else item2
+        return ItemPairVote(item1, item2, choice, timestamp)
+
+    def add(self, vote: ItemPairVote):
+        item1_id = vote.get_item_1().get_id()
+        item2_id = vote.get_item_2().get_id()
+        bigger = vote.get_bigger()
+        self.__connection.execute(
+            "INSERT INTO votes (item_low, item_high, item1_id, item2_id, bigger_id, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (min(item1_id, item2_id), max(item1_id, item2_id), item1_id, item2_id,
+             None if bigger is None else bigger.get_id(), vote.get_timestamp()))
+        self.__count += 1
+
+    def update(self, vote: ItemPairVote):
+        item1_id = vote.get_item_1().get_id()
+        item2_id = vote.get_item_2().get_id()
+        bigger = vote.get_bigger()
+        with self.transaction():
+            self.__connection.execute(
+                "UPDATE votes SET item1_id = ?, item2_id = ?, bigger_id = ?, timestamp = ? "
+                "WHERE item_low = ? AND item_high = ?",
+                (item1_id, item2_id, None if bigger is None else bigger.get_id(), vote.get_timestamp(),
+                 min(item1_id, item2_id), max(item1_id, item2_id)))
+            # the saved graph state holds the previous outcome
+            self.__connection.execute("DELETE FROM vote_graph_info")
+
+    def get(self, item1_id: int, item2_id: int) -> Optional[ItemPairVote]:
+        row = self.__connection.execute(
+            "SELECT item1_id, item2_id, bigger_id, timestamp FROM votes WHERE item_low = ? AND item_high = ?",
+            (min(item1_id, item2_id), max(item1_id, item2_id))).fetchone()
+        return None if row is None else self.__build_vote(row)
+
+    def contains(self, item1_id: int, item2_id: int) -> bool:
+        return self.__connection.execute(
+            "SELECT 1 FROM votes WHERE item_low = ? AND item_high = ?",
+            (min(item1_id, item2_id), max(item1_id, item2_id))).fetchone() is not None
+
+    def get_item_votes(self, item_id: int) -> list:
+        rows = self.__connection.execute(
+            "SELECT item1_id, item2_id, bigger_id, timestamp FROM votes WHERE item_low = ? "
+            "UNION ALL SELECT item1_id, item2_id, bigger_id, timestamp FROM votes WHERE item_high = ?",
+            (item_id, item_id))
+        return [self.__build_vote(row) for row in rows if self.__has_items(row)]
+
+    def get_item_vote_counts(self, item_id: int) -> tuple:
+        certain = uncertain = 0
+        for column in ("item_low", "item_high"):
+            row = self.__connection.execute(
+                f"SELECT COUNT(bigger_id), COUNT(*) - COUNT(bigger_id) FROM votes WHERE {column} = ?",
+                (item_id,)).fetchone()
+            certain += row[0]
+            uncertain += row[1]
+        return certain, uncertain
+
+    def iter_votes(self):
+        rows = self.__connection.execute("SELECT item1_id, item2_id, bigger_id, timestamp FROM votes ORDER BY rowid")
+        return (self.__build_vote(row) for row in rows if self.__has_items(row))
+
+    def iter_outcomes(self):
+        rows = self.__connection.execute("SELECT item1_id, item2_id, bigger_id FROM votes ORDER BY rowid")
+        return (row for row in rows if self.__has_items(row))
+
+    def iter_item_outcomes(self, item_id: int):
+        rows = self.__connection.execute(
+            "SELECT item1_id, item2_id, bigger_id FROM votes WHERE item_low = ? "
+            "UNION ALL SELECT item1_id, item2_id, bigger_id FROM votes WHERE item_high = ?",
+            (item_id, item_id))
+        return (row for row in rows if self.__has_items(row))
+
+    def __get_graph_vote_count(self) -> Optional[int]:
+        row = self.__connection.execute("SELECT vote_count FROM vote_graph_info").fetchone()
+        return None if row is None else row[0]
+
+    def get_graph_state(self) -> Optional[tuple]:
+        if self.__get_graph_vote_count() != self.__count:
+            return None
+        rows = self.__connection.execute("SELECT item_id, root_id, position FROM vote_graph").fetchall()
+        if any(self.__items.find_item_by_id(row[0]) is None for row in rows):
+            return None
+        # votes on items back in the list since the state was saved are not in it
+        missing = self.__connection.execute(
+            "SELECT item_low FROM votes UNION SELECT item_high FROM votes "
+            "EXCEPT SELECT item_id FROM vote_graph").fetchall()
+        if any(self.__items.find_item_by_id(row[0]) is not None for row in missing):
+            return None
+        rejected = self.__connection.execute(
+            "SELECT item1_id, item2_id, bigger_id FROM vote_graph_rejected "
+            "JOIN votes USING (item_low, item_high)").fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows], rejected
+
+    def save_graph_state(self, graph_state: tuple):
+        if self.__get_graph_vote_count() == self.__count:
+            # saved for the same votes
+            return
+        item_ids, root_ids, positions, rejected = graph_state
+        with self.transaction():
+            for table in ("vote_graph", "vote_graph_rejected", "vote_graph_info"):
+                self.__connection.execute(f"DELETE FROM {table}")
+            self.__connection.executemany("INSERT INTO vote_graph VALUES (?, ?, ?)",
+                                          zip(item_ids, root_ids, positions))
+            self.__connection.executemany(
+                "INSERT INTO vote_graph_rejected VALUES (?, ?)",
+                ((min(item1_id, item2_id), max(item1_id, item2_id)) for item1_id, item2_id, _ in rejected))
+            self.__connection.execute("INSERT INTO vote_graph_info VALUES (?)", (self.__count,))
+
+    def find_votes_not_matching_positions(self, position_by_id: dict) -> list:
+        with self.transaction():
+            self.__connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS positions (item_id INTEGER PRIMARY KEY, position INTEGER NOT NULL)")
+            self.__connection.execute("DELETE FROM positions")
+            self.__connection.executemany("INSERT INTO positions VALUES (?, ?)", position_by_id.items())
+        rows = self.__connection.execute(
+            "SELECT item1_id, item2_id, bigger_id, timestamp FROM votes "
+            "JOIN positions AS bigger ON bigger.item_id = votes.bigger_id "
+            "JOIN positions AS smaller ON smaller.item_id = votes.item_low + votes.item_high - votes.bigger_id "
+            "WHERE bigger.position <= smaller.position ORDER BY votes.rowid").fetchall()
+        return _build_not_matching(self.__build_vote, rows, len(position_by_id))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        if self.__connection.in_transaction:
+            yield
+            return
+        self.__connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.__connection.execute("ROLLBACK")
+            self.__count = self.__connection.execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+            raise
+        self.__connection.execute("COMMIT")
+
+    def close(self):
+        self.__connection.close()
+
+    def __len__(self):
+        return self.__count
+
+
+_SNAPSHOT_MAGIC = b"LSVOTES\0"
+_SNAPSHOT_VERSION = 2
+# magic, version, flags, item count, vote count, hash table capacity, journal size and mtime_ns, rejected vote count
+_SNAPSHOT_HEADER = struct.Struct("<8sIIQQQQqQ")
+_SNAPSHOT_HAS_GRAPH = 1
+
+
+def _snapshot_padding(size: int) -> int:
+    return -size % 8
+
+
+@typechecked
+def write_vote_snapshot(filename: str, store: VoteStore, journal_filename: str, graph_state: Optional[tuple] = None):
+    """Write the votes of store as a snapshot that MappedVoteStore opens without reading every vote.
+
+    Little endian sections, each starting at a multiple of 8 bytes, after the header: item ids
+    (int64), per vote record columns of the item indexes (int32, twice), outcome (int8) and
+    timestamp (float64), the pair hash table of ArrayVoteStore (int32 rows), and the rows of every
+    item (int64 offsets into int32 rows). With graph_state (VotesCache.get_graph_state), the bucket
+    root (int32 item index) and position of every item and the rows of the rejected votes (int32)
+    follow, so the graph opens without replaying the votes. The size and mtime of
+    journal_filename, the votes csv, are kept to tell when the snapshot is stale. Written through a
+    temp file renamed over filename.
+    """
+    index_by_id = {}
+    ids = array('q')
+    item1 = array('i')
+    item2 = array('i')
+    outcome = array('b')
+    timestamp = array('d')
+    for vote in store.iter_votes():
+        for item in (vote.get_item_1(), vote.get_item_2()):
+            if item.get_id() not in index_by_id:
+                index_by_id[item.get_id()] = len(ids)
+                ids.append(item.get_id())
+        item1.append(index_by_id[vote.get_item_1().get_id()])
+        item2.append(index_by_id[vote.get_item_2().get_id()])
+        choice = vote.get_choice()
+        outcome.append(_OUTCOME_UNDECIDED if choice is None else
+                       _OUTCOME_ITEM_1 if choice is vote.get_item_1() else _OUTCOME_ITEM_2)
+        timestamp.append(vote.get_timestamp())
+    vote_count = len(item1)
+    capacity = 8
+    while 4 * vote_count > 3 * capacity:
+        capacity *= 2
+    shift = 64 - (capacity - 1).bit_length()
+    table = array('i', [_EMPTY_SLOT]) * capacity
+    for row, (index1, index2) in enumerate(zip(item1, item2)):
+        key = (min(index1, index2) << 32) | max(index1, index2)
+        slot = ((key * _HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> shift
+        while table[slot] != _EMPTY_SLOT:
+            slot = (slot + 1) & (capacity - 1)
+        table[slot] = row
+    offsets = array('q', [0]) * (len(ids) + 1)
+    for index in itertools.chain(item1, item2):
+        offsets[index + 1] += 1
+    for index in range(len(ids)):
+        offsets[index + 1] += offsets[index]
+    rows = array('i', [0]) * (2 * vote_count)
+    next_offsets = offsets[:-1]
+    for row, (index1, index2) in enumerate(zip(item1, item2)):
+        for index in (index1, index2):
+            rows[next_offsets[index]] = row
+            next_offsets[index] += 1
+    sections = [ids, item1, item2, outcome, timestamp, table, offsets, rows]
+    graph_sections = _build_snapshot_graph_sections(index_by_id, item1, item2, graph_state)
+    sections.extend(graph_sections)
+    journal_stat = os.stat(journal_filename) if os.path.exists(journal_filename) else None
+    header = _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, _SNAPSHOT_HAS_GRAPH if graph_sections else 0,
+                                   len(ids), vote_count, capacity,
+                                   0 if journal_stat is None else journal_stat.st_size,
+                                   0 if journal_stat is None else journal_stat.st_mtime_ns,
+                                   len(graph_sections[2]) if graph_sections else 0)
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, 'wb') as snapshot_file:
+        snapshot_file.write(header)
+        for section in sections:
+            if sys.byteorder != "little":
+                section = array(section.typecode, section)
+                section.byteswap()
+            data = section.tobytes()
+            snapshot_file.write(data)
+            snapshot_file.write(bytes(_snapshot_padding(len(data))))
+    os.replace(temp_filename, filename)
+
+
+def _build_snapshot_graph_sections(index_by_id: dict, item1: array, item2: array, graph_state: Optional[tuple]) -> list:
+    """[roots, positions, rejected rows] arrays of graph_state, [] without one or if it misses items."""
+    if graph_state is None:
+        return []
+    item_ids, root_ids, positions, rejected = graph_state
+    roots = array('i', [0]) * len(index_by_id)
+    snapshot_positions = array('i', [0]) * len(index_by_id)
+    found = 0
+    for item_id, root_id, position in zip(item_ids, root_ids, positions):
+        index = index_by_id.get(item_id)
+        if index is None:
+            # registered without votes
+            continue
+        roots[index] = index_by_id[root_id]
+        snapshot_positions[index] = position
+        found += 1
+    if found != len(index_by_id):
+        return []
+    row_by_key = {}
+    if rejected:
+        for row, (index1, index2) in enumerate(zip(item1, item2)):
+            row_by_key[(min(index1, index2), max(index1, index2))] = row
+    rejected_rows = array('i')
+    for item1_id, item2_id, _ in rejected:
+        index1 = index_by_id[item1_id]
+        index2 = index_by_id[item2_id]
+        rejected_rows.append(row_by_key[(min(index1, index2), max(index1, index2))])
+    return [roots, snapshot_positions, rejected_rows]
+
+
+@typechecked
+class MappedVoteStore(VoteStore):
+    """Votes of a snapshot written by write_vote_snapshot, memory mapped, plus the votes added since.
+
+    Opening only maps the file: pairs are found through the hash table of the snapshot, the votes
+    of an item through its rows, and ItemPairVote objects are built when a vote is read. Votes
+    added after opening are kept in a DictVoteStore. Items resolves the snapshot ids, which must
+    all be in it (see open_vote_snapshot).
+    """
+
+    def __init__(self, filename: str, items: Items):
+        self.__items = items
+        with open(filename, 'rb') as snapshot_file:
+            # copy on write: update changes rows in memory only
+            self.__mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        try:
+            magic, version, flags, item_count, vote_count, capacity, journal_size, journal_mtime_ns, rejected_count = \
+                _SNAPSHOT_HEADER.unpack_from(self.__mmap)
+        except struct.error:
+            self.__mmap.close()
+            raise ValueError(f"{filename} is not a vote snapshot")
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+            self.__mmap.close()
+            raise ValueError(f"{filename} is not a version {_SNAPSHOT_VERSION} vote snapshot")
+        if sys.byteorder != "little":
+            self.__mmap.close()
+            raise ValueError("vote snapshots are only mapped on little endian machines")
+        self.__journal_stat = (journal_size, journal_mtime_ns)
+        self.__views = []
+        offset = _SNAPSHOT_HEADER.size
+        sections = []
+        layout = [('q', item_count), ('i', vote_count), ('i', vote_count), ('b', vote_count),
+                  ('d', vote_count), ('i', capacity), ('q', item_count + 1), ('i', 2 * vote_count)]
+        if flags & _SNAPSHOT_HAS_GRAPH:
+            layout += [('i', item_count), ('i', item_count), ('i', rejected_count)]
+        for typecode, count in layout:
+            size = count * array(typecode).itemsize
+            if offset + size > len(self.__mmap):
+                self.close()
+                raise ValueError(f"{filename} is truncated")
+            view = memoryview(self.__mmap)[offset:offset + size]
+            self.__views.append(view)
+            sections.append(view.cast(typecode))
+            offset += size + _snapshot_padding(size)
+        self.__views.extend(sections)
+        self.__ids, self.__item1, self.__item2, self.__outcome, self.__timestamp, self.__table, \
+            self.__offsets, self.__rows = sections[:8]
+        # bucket roots, positions and rejected rows, see write_vote_snapshot
+        self.__graph_sections = sections[8:]
+        self.__shift = 64 - (capacity - 1).bit_length()
+        self.__mask = capacity - 1
+        self.__vote_count = vote_count
+        self.__index_by_id = None  # type: Optional[dict[int, int]]
+        self.__wrapped_items = None  # type: Optional[list[ItemWrapper]]
+        self.__added = DictVoteStore()
+
+    def get_journal_stat(self) -> tuple:
+        """(size, mtime_ns) of the votes csv when the snapshot was written."""
+        return self.__journal_stat
+
+    def get_ids(self):
+        return self.__ids
+
+    def __get_index_by_id(self) -> dict:
+        if self.__index_by_id is None:
+            self.__index_by_id = dict(zip(self.__ids, range(len(self.__ids))))
+        return self.__index_by_id
+
+    def __get_item(self, index: int) -> ItemWrapper:
+        if self.__wrapped_items is None:
+            self.__wrapped_items = [self.__items.get_item_by_id(item_id) for item_id in self.__ids]
+        return self.__wrapped_items[index]
+
+    def __get_row(self, item1_id, item2_id):
+        index_by_id = self.__get_index_by_id()
+        item1 = index_by_id.get(item1_id)
+        item2 = index_by_id.get(item2_id)
+        if item1 is None or item2 is None:
+            return None
+        table = self.__table
+        key = (min(item1, item2) << 32) | max(item1, item2)
+        slot = ((key * _HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.__shift
+        while True:
+            row = table[slot]
+            if row == _EMPTY_SLOT:
+                return None
+            if (self.__item1[row] == item1 and self.__item2[row] == item2) or \
+                    (self.__item1[row] == item2 and self.__item2[row] == item1):
+                return row
+            slot = (slot + 1) & self.__mask
+
+    def __get_item_rows(self, item_id: int):
+        index = self.__get_index_by_id().get(item_id)
+        if index is None:
+            return self.__rows[0:0]
+        return self.__rows[self.__offsets[index]:self.__offsets[index + 1]]
+
+    def __build_vote(self, row):
+        item1 = self.__get_item(self.__item1[row])
+        item2 = self.__get_item(self.__item2[row])
+        outcome = self.__outcome[row]
+        choice = item1 if outcome == _OUTCOME_ITEM_1 else item2 if outcome == _OUTCOME_ITEM_2 else None
+        return ItemPairVote(item1, item2, choice, self.__timestamp[row])
+
+    def add(self, vote: ItemPairVote):
+        self.__added.add(vote)
+
+    def update(self, vote: ItemPairVote):
+        row = self.__get_row(vote.get_item_1().get_id(), vote.get_item_2().get_id())
+        if row is None:
+            self.__added.update(vote)
+            return
+        # written to the private copy of the page, the file keeps the snapshot
+        self.__outcome[row] = _get_row_outcome(vote, self.__ids[self.__item1[row]])
+        self.__timestamp[row] = vote.get_timestamp()
+        # the saved graph state holds the previous outcome
+        self.__graph_sections = []
+
+    def get_added_count(self) -> int:
+        """Votes added since the snapshot was opened."""
+        return len(self.__added)
+
+    def get(self, item1_id: int, item2_id: int) -> Optional[ItemPairVote]:
+        row = self.__get_row(item1_id, item2_id)
+        return self.__added.get(item1_id, item2_id) if row is None else self.__build_vote(row)
+
+    def contains(self, item1_id: int, item2_id: int) -> bool:
+        return self.__get_row(item1_id, item2_id) is not None or self.__added.contains(item1_id, item2_id)
+
+    def get_item_votes(self, item_id: int) -> list:
+        return [self.__build_vote(row) for row in self.__get_item_rows(item_id)] + \
+            self.__added.get_item_votes(item_id)
+
+    def get_item_vote_counts(self, item_id: int) -> tuple:
+        rows = self.__get_item_rows(item_id)
+        uncertain = sum(1 for row in rows if self.__outcome[row] == _OUTCOME_UNDECIDED)
+        certain = len(rows) - uncertain
+        added_certain, added_uncertain = self.__added.get_item_vote_counts(item_id)
+        return certain + added_certain, uncertain + added_uncertain
+
+    def iter_votes(self):
+        return itertools.chain((self.__build_vote(row) for row in range(self.__vote_count)), self.__added.iter_votes())
+
+    def __get_outcome(self, row) -> tuple:
+        item1_id = self.__ids[self.__item1[row]]
+        item2_id = self.__ids[self.__item2[row]]
+        outcome = self.__outcome[row]
+        return item1_id, item2_id, item1_id if outcome == _OUTCOME_ITEM_1 else item2_id if outcome else None
+
+    def iter_outcomes(self):
+        ids = self.__ids
+        for item1, item2, outcome in zip(self.__item1, self.__item2, self.__outcome):
+            item1_id = ids[item1]
+            item2_id = ids[item2]
+            yield item1_id, item2_id, item1_id if outcome == _OUTCOME_ITEM_1 else item2_id if outcome else None
+        yield from self.__added.iter_outcomes()
+
+    def iter_item_outcomes(self, item_id: int):
+        for row in self.__get_item_rows(item_id):
+            yield self.__get_outcome(row)
+        yield from self.__added.iter_item_outcomes(item_id)
+
+    def get_graph_state(self) -> Optional[tuple]:
+        if not self.__graph_sections:
+            return None
+        roots, positions, rejected_rows = self.__graph_sections
+        ids = self.__ids.tolist()
+        return ids, [ids[root] for root in roots], positions.tolist(), \
+            [self.__get_outcome(row) for row in rejected_rows]
+
+    def find_votes_not_matching_positions(self, position_by_id: dict) -> list:
+        position_by_index = [position_by_id.get(item_id) for item_id in self.__ids]
+        rows = _find_rows_not_matching(self.__item1, self.__item2, self.__outcome, position_by_index)
+        return _build_not_matching(self.__build_vote, rows, len(position_by_id)) + \
+            self.__added.find_votes_not_matching_positions(position_by_id)
+
+    def close(self):
+        # views first: the map cannot be closed while they export its buffer
+        for view in reversed(self.__views):
+            view.release()
+        self.__views = []
+        self.__mmap.close()
+
+    def __len__(self):
+        return self.__vote_count + len(self.__added)
+
+
+@typechecked
+def open_vote_snapshot(filename: str, items: Items, journal_filename: str) -> Optional[MappedVoteStore]:
+    """MappedVoteStore of the snapshot, None if there is none or it is stale or unreadable.
+
+    A snapshot is stale when the votes csv changed since it was written, or when it has votes on
+    items missing from items: replaying the csv keeps those apart (see VotesCache.load_from_csv).
+    """
+    if not os.path.exists(filename):
+        return None
+    try:
+        store = MappedVoteStore(filename, items)
+    except (OSError, ValueError) as error:
+        logging.warning(f"ignoring vote snapshot {filename}: {error}")
+        return None
+    journal_stat = os.stat(journal_filename) if os.path.exists(journal_filename) else None
+    if store.get_journal_stat() != ((0, 0) if journal_stat is None else (journal_stat.st_size,
+                                                                          journal_stat.st_mtime_ns)):
+        logging.info(f"vote snapshot {filename} is older than {journal_filename}")
+        store.close()
+        return None
+    if any(items.find_item_by_id(item_id) is None for item_id in store.get_ids()):
+        logging.info(f"vote snapshot {filename} has votes on items no longer in the list")
+        store.close()
+        return None
+    return store
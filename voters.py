@@ -0,0 +1,175 @@
+import csv
+import logging
+import os
+import sys
+from typing import Optional
+
+from item import ItemWrapper
+from typechecking import typechecked
+from vote import ItemPairVote
+from vote import build_pair_key
+
+
+class UnansweredComparisonException(Exception):
+    pass
+
+
+@typechecked
+class Voter:
+    """Answers comparisons the votes cannot: vote returns the bigger item, or None when undecided."""
+
+    def vote(self, item1: ItemWrapper, item2: ItemWrapper) -> Optional[ItemWrapper]:
+        raise NotImplementedError()
+
+    def vote_round(self, pairs: list) -> list:
+        """Answers of a round of independent (item1, item2) comparisons, one by one unless overridden."""
+        return [self.vote(item1, item2) for item1, item2 in pairs]
+
+
+@typechecked
+class TerminalVoter(Voter):
+    """Asks the user in the terminal."""
+
+    def vote(self, item1: ItemWrapper, item2: ItemWrapper) -> Optional[ItemWrapper]:
+        assert item1.get_id() != item2.get_id()
+        while True:
+            sys.stdout.write(
+                "Witch one rate higher? 1:<<<{0}>>> , 2:<<<{1}>>> n:cannot say?".format(item1.format_short(),
+                                                                                        item2.format_short()))
+            choice = input().lower()
+
+            if choice == '2':
+                # arg1<arg2
+                return item2
+            elif choice == '1':
+                # arg1>arg2
+                return item1
+            elif choice == 'n':
+                return None
+            else:
+                sys.stdout.write(f"bad answer {choice}")
+
+
+@typechecked
+class CallbackVoter(Voter):
+    """Delegates to callback(item1, item2), which returns the bigger item or None: other frontends, simulations."""
+
+    def __init__(self, callback):
+        self.__callback = callback
+
+    def vote(self, item1: ItemWrapper, item2: ItemWrapper) -> Optional[ItemWrapper]:
+        return self.__callback(item1, item2)
+
+
+@typechecked
+class ScriptedVoter(Voter):
+    """Answers from a fixed set of (bigger id, smaller id) answers, undecided when bigger id is None.
+
+    Comparisons missing from the script go to the fallback voter, or raise
+    UnansweredComparisonException when there is none.
+    """
+
+    def __init__(self, answers: dict, fallback: Optional[Voter] = None):
+        """answers maps (item1 id, item2 id) pairs, in any order, to the bigger id or None."""
+        self.__answers = {build_pair_key(*pair): bigger_id for pair, bigger_id in answers.items()}
+        self.__fallback = fallback
+
+    @staticmethod
+    def from_csv(filename: str, fallback: Optional[Voter] = None) -> 'ScriptedVoter':
+        """Answers from a csv in the votes csv format (bigger_id, vote, smaller_id), e.g. another list's votes."""
+        answers = {}
+        with open(filename, newline='', encoding='utf-8-sig') as csv_file:
+            for row in csv.DictReader(csv_file):
+                bigger_id = int(row[ItemPairVote.CsvFieldNames.item1_id])
+                smaller_id = int(row[ItemPairVote.CsvFieldNames.item2_id])
+                choice = row[ItemPairVote.CsvFieldNames.choice]
+                answers[(bigger_id, smaller_id)] = bigger_id if choice == ">" else None
+        return ScriptedVoter(answers, fallback)
+
+    def vote(self, item1: ItemWrapper, item2: ItemWrapper) -> Optional[ItemWrapper]:
+        key = build_pair_key(item1.get_id(), item2.get_id())
+        if key not in self.__answers:
+            if self.__fallback is None:
+                raise UnansweredComparisonException(f"no scripted answer for {item1} vs {item2}")
+            return self.__fallback.vote(item1, item2)
+        bigger_id = self.__answers[key]
+        if bigger_id is None:
+            return None
+        return item1 if bigger_id == item1.get_id() else item2
+
+
+@typechecked
+class CsvRoundVoter(Voter):
+    """Answers rounds of comparisons through a csv file, to be answered offline or in a row.
+
+    A round with comparisons not answered in filename is written to it, with answers already
+    given kept, and raises UnansweredComparisonException: fill its vote column with 1, 2 or n
+    (cannot say) and run again. Answered rounds are returned as they are found in the file, and
+    stored with the other votes. Best used with SortStrategy.TournamentRounds.
+    """
+
+    class CsvFieldNames:
+        item1_id = "item1_id"
+        item1_desc = "item1_desc"
+        item2_id = "item2_id"
+        item2_desc = "item2_desc"
+        choice = "vote"
+        csv_headers = (item1_id, item1_desc, item2_id, item2_desc, choice)
+
+    def __init__(self, filename: str):
+        self.__filename = filename
+
+    def get_filename(self):
+        return self.__filename
+
+    def __read_answers(self) -> dict:
+        answers = {}
+        if not os.path.exists(self.__filename):
+            return answers
+        with open(self.__filename, newline='', encoding='utf-8-sig') as csv_file:
+            for row in csv.DictReader(csv_file):
+                choice = (row.get(self.CsvFieldNames.choice) or "").strip().lower()
+                try:
+                    item1_id = int(row[self.CsvFieldNames.item1_id])
+                    item2_id = int(row[self.CsvFieldNames.item2_id])
+                except (TypeError, ValueError):
+                    logging.warning("skipping broken row {} in {}".format(row, self.__filename))
+                    continue
+                if choice in ("1", "2", "n"):
+                    bigger_id = item1_id if choice == "1" else item2_id if choice == "2" else None
+                    answers[build_pair_key(item1_id, item2_id)] = bigger_id
+                elif choice:
+                    logging.warning("bad answer {} in {}".format(choice, self.__filename))
+        return answers
+
+    def __write_round(self, pairs: list, answers: dict):
+        with open(self.__filename, mode='w', encoding='utf-8-sig', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=self.CsvFieldNames.csv_headers)
+            writer.writeheader()
+            for item1, item2 in pairs:
+                key = build_pair_key(item1.get_id(), item2.get_id())
+                if key not in answers:
+                    choice = ""
+                elif answers[key] is None:
+                    choice = "n"
+                else:
+                    choice = "1" if answers[key] == item1.get_id() else "2"
+                writer.writerow({self.CsvFieldNames.item1_id: item1.get_id(),
+                                 self.CsvFieldNames.item1_desc: item1.format_description(),
+                                 self.CsvFieldNames.item2_id: item2.get_id(),
+                                 self.CsvFieldNames.item2_desc: item2.format_description(),
+                                 self.CsvFieldNames.choice: choice})
+
+    def vote(self, item1: ItemWrapper, item2: ItemWrapper) -> Optional[ItemWrapper]:
+        return self.vote_round([(item1, item2)])[0]
+
+    def vote_round(self, pairs: list) -> list:
+        answers = self.__read_answers()
+        unanswered = [pair for pair in pairs if build_pair_key(pair[0].get_id(), pair[1].get_id()) not in answers]
+        if unanswered:
+            self.__write_round(pairs, answers)
+            raise UnansweredComparisonException(
+                f"answer the {len(unanswered)} comparisons in {self.__filename} (vote column: 1, 2 or n) and run again")
+        bigger_ids = [answers[build_pair_key(item1.get_id(), item2.get_id())] for item1, item2 in pairs]
+        return [None if bigger_id is None else item1 if bigger_id == item1.get_id() else item2
+                for (item1, item2), bigger_id in zip(pairs, bigger_ids)]
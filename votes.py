@@ -1,50 +1,156 @@
 import csv
-import functools
 import logging
+import os
 from typing import Optional
 
-import typeguard
-
 from common_utils import common_repr
 from item import ItemWrapper
 from items import Items
+from metrics import METRICS
+from typechecking import typechecked
 from vote import ItemPairVote
-from vote import ItemPairVoteKey
+from vote_graph import VoteGraph
+from vote_stores import DictVoteStore, VoteStore
 
 
-@typeguard.typechecked
+@typechecked
 class VotesCache:
-    def __init__(self, items: Items):
-        self.__votes = {}  # type: dict[ItemPairVoteKey, ItemPairVote]
+    def __init__(self, items: Items, store: Optional[VoteStore] = None):
+        """store keeps the votes, a DictVoteStore by default (see vote_stores.py for the others)."""
+        self.__store = DictVoteStore() if store is None else store
         self.__items = items  # type: Items
+        # built on first use, so a store that already holds votes opens without reading them
+        self.__graph = None  # type: Optional[VoteGraph]
+        # csv rows of votes on items missing from items (removed from its csv), written back by save_to_csv_file
+        self.__detached_rows = []  # type: list[dict]
+        # (item1_id, item2_id, bigger_id) of the votes the graph rejected, and the cycles of the first
+        # ones, see get_conflicts
+        self.__rejected = []  # type: list[tuple]
+        self.__conflicts = []  # type: list[list[ItemPairVote]]
 
     def add(self, x: ItemWrapper, y: ItemWrapper, choice: Optional[ItemWrapper], timestamp: float = None):
-        assert typeguard.check_argument_types()
         new_vote = ItemPairVote(x, y, choice, timestamp)
-        new_key = new_vote.get_key()
-        assert isinstance(new_key, ItemPairVoteKey)
-        if new_key in self.__votes:
-            self.__votes[new_key].addVote(new_vote)
-            pass
+        found = self.__store.get(x.get_id(), y.get_id())
+        if found is not None:
+            found_bigger = found.get_bigger()
+            if (None if found_bigger is None else found_bigger.get_id()) != (None if choice is None else choice.get_id()):
+                # a re-vote: the graph cannot drop the previous outcome, it is built again on next use
+                self.__store.update(new_vote)
+                self.__graph = None
+                self.__rejected = []
+                self.__conflicts = []
+        else:
+            graph = self.get_graph()
+            self.__store.add(new_vote)
+            if not self.__add_to_graph(graph, x.get_id(), y.get_id(), None if choice is None else choice.get_id()):
+                # the cycle is only built by get_conflicts, when the conflicts are reported
+                logging.warning(f"vote contradicts previous votes: {new_vote.format()}")
+
+    def __add_to_graph(self, graph: VoteGraph, item1_id: int, item2_id: int, bigger_id: Optional[int]) -> bool:
+        """Add a vote of the store to graph, recording it if the graph rejects it."""
+        if bigger_id is None:
+            added = graph.add_tie(item1_id, item2_id)
         else:
-            self.__votes[new_key] = ItemPairVote(x, y, choice)
+            added = graph.add(bigger_id, item2_id if bigger_id == item1_id else item1_id)
+        if not added:
+            self.__rejected.append((item1_id, item2_id, bigger_id))
+            METRICS.increment("vote_conflicts")
+        return added
+
+    def __build_conflict(self, graph: VoteGraph, item1_id: int, item2_id: int, bigger_id: Optional[int]) -> list:
+        if bigger_id is None:
+            upper_id, lower_id = (item1_id, item2_id) if graph.compare_ids(item1_id, item2_id) == 1 \
+                else (item2_id, item1_id)
+        else:
+            # the rejected vote says bigger_id > other, the graph already has other >= bigger_id
+            upper_id, lower_id = (item2_id, item1_id) if bigger_id == item1_id else (item1_id, item2_id)
+        chain = graph.find_chain(upper_id, lower_id) + [(item1_id, item2_id)]
+        return [self.__store.get(id1, id2) for id1, id2 in chain]
 
     def get(self, x: ItemWrapper, y: ItemWrapper) -> Optional[ItemPairVote]:
-        key = ItemPairVote.get_key_static(x, y)
-        if key in self.__votes:
-            return self.__votes[key]
-        return None
+        return self.__store.get(x.get_id(), y.get_id())
+
+    def get_graph(self) -> VoteGraph:
+        if self.__graph is None:
+            state = self.__store.get_graph_state()
+            if state is not None:
+                # saved with the votes: only the buckets searched read their votes
+                self.__graph = VoteGraph.from_state(state[:3], self.__store.iter_item_outcomes)
+                self.__rejected = list(state[3])
+        if self.__graph is None:
+            self.__graph = VoteGraph.from_outcomes(self.__store.iter_outcomes())
+        if self.__graph is None:
+            # votes contradict: add them one by one to find which ones
+            self.__graph = VoteGraph()
+            for item1_id, item2_id, bigger_id in self.__store.iter_outcomes():
+                self.__add_to_graph(self.__graph, item1_id, item2_id, bigger_id)
+        return self.__graph
+
+    def get_graph_state(self) -> Optional[tuple]:
+        """VoteGraph.get_state plus the rejected votes, for stores to save, None if the graph was not built."""
+        if self.__graph is None:
+            return None
+        return self.__graph.get_state() + (list(self.__rejected),)
+
+    def get_conflicts(self) -> list:
+        """Cycles of contradicting votes, each a list of ItemPairVote ending with the vote the graph rejected.
+
+        Votes are rejected as they are added, each cycle is then the shortest chain of accepted votes its
+        rejected vote contradicts, so re-asking any vote of a cycle may resolve it.
+        """
+        graph = self.get_graph()
+        for rejected in self.__rejected[len(self.__conflicts):]:
+            self.__conflicts.append(self.__build_conflict(graph, *rejected))
+        return list(self.__conflicts)
+
+    def get_votes_to_reask(self) -> list:
+        """Few votes that together are in every conflict cycle, re-asking them may resolve all the cycles.
+
+        Greedy cover: the vote in most of the cycles left goes first, the newest one among equals.
+        """
+        cycles = [{vote.get_key(): vote for vote in cycle} for cycle in self.get_conflicts()]
+        to_reask = []
+        while cycles:
+            votes_by_key = {}
+            cycle_count_by_key = {}
+            for cycle in cycles:
+                for key, vote in cycle.items():
+                    votes_by_key[key] = vote
+                    cycle_count_by_key[key] = cycle_count_by_key.get(key, 0) + 1
+            key = max(cycle_count_by_key,
+                      key=lambda key_: (cycle_count_by_key[key_], votes_by_key[key_].get_timestamp()))
+            to_reask.append(votes_by_key[key])
+            cycles = [cycle for cycle in cycles if key not in cycle]
+        return to_reask
+
+    def get_store(self) -> VoteStore:
+        return self.__store
+
+    def get_item_votes(self, item1: ItemWrapper) -> list:
+        return self.__store.get_item_votes(item1.get_id())
+
+    def get_inferred_cmp(self, x: ItemWrapper, y: ItemWrapper) -> Optional[int]:
+        """Comparison known from votes, directly or transitively (a > b and b > c gives a > c).
+
+        1 if x > y, -1 if x < y, 0 if both are in the same bucket of tied items, None if unknown.
+        """
+        return self.get_graph().compare_ids(x.get_id(), y.get_id())
+
+    def iter_votes(self):
+        return self.__store.iter_votes()
 
     def format(self):
-        return "\n".join(map(lambda x: x.format(), self.__votes.values()))
+        return "\n".join(map(lambda x: x.format(), self.iter_votes()))
 
     def print(self) -> None:
-        logging.debug("{} {} elements begin".format(self.__class__.__name__, len(self.__votes)))
+        if not logging.root.isEnabledFor(logging.DEBUG):
+            return
+        logging.debug("{} {} elements begin".format(self.__class__.__name__, len(self)))
         logging.debug(self.format())
-        logging.debug("{} {} elements end".format(self.__class__.__name__, len(self.__votes)))
+        logging.debug("{} {} elements end".format(self.__class__.__name__, len(self)))
 
     def save_to_csv_file(self, filename):
-        votes = self.__votes.values()
+        votes = self.iter_votes()
         votes_dicts = list(map(lambda x: x.build_dict_for_csv(), votes))
 
         csv_columns = ItemPairVote.CsvFieldNames.csv_headers
@@ -56,11 +162,15 @@ class VotesCache:
             writer.writeheader()
             for data in dict_data:
                 writer.writerow(data)
+            for row in self.__detached_rows:
+                writer.writerow({field: row.get(field) for field in csv_columns})
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
 
     def get_elements_with_known_votes(self):
         items = set()
         have_unknown = set()
-        for vote in self.__votes.values():
+        for vote in self.iter_votes():
             items.add(vote.get_item_1())
             items.add(vote.get_item_2())
 
@@ -71,10 +181,15 @@ class VotesCache:
         return items - have_unknown, have_unknown
 
     def get_item_uncertainty(self, item1: ItemWrapper):
-        return sum(1 for vote in self.__votes.values() if vote.contains_item_id(item1.get_id()) and vote.is_uncertain())
+        return self.__store.get_item_vote_counts(item1.get_id())[1]
 
     def get_item_certainty(self, item1: ItemWrapper):
-        return sum(1 for vote in self.__votes.values() if vote.contains_item_id(item1.get_id()) and vote.is_certain())
+        return self.__store.get_item_vote_counts(item1.get_id())[0]
+
+    def get_item_certainty_rank_key(self, item1: ItemWrapper):
+        # same order as items_certainty_rank_comparator: more uncertainty first, then less certainty first
+        certain, uncertain = self.__store.get_item_vote_counts(item1.get_id())
+        return -uncertain, certain
 
     def items_certainty_rank_comparator_lt(self, item1: ItemWrapper, item2: ItemWrapper):
         item1_un = self.get_item_uncertainty(item1)
@@ -107,12 +222,7 @@ class VotesCache:
         return 0
 
     def get_items_sorted_by_certainty(self):
-        parent_self = self
-
-        def items_certainty_rank_comparator_1(item1: ItemWrapper, item2: ItemWrapper):
-            return parent_self.items_certainty_rank_comparator(item1, item2)
-
-        return sorted(self.__items.get_wrapped_items(), key=functools.cmp_to_key(items_certainty_rank_comparator_1))
+        return sorted(self.__items.get_wrapped_items(), key=self.get_item_certainty_rank_key)
 
     def get_items_from_ids(self, item1_id: int, item2_id: int):
         bigger = self.__items.get_item_by_id(item1_id)
@@ -120,10 +230,9 @@ class VotesCache:
         return bigger, smaller
 
     def get_vote_from_pair(self, bigger_id: int, smaller_id: int) -> Optional[ItemPairVote]:
-        if len(self.__votes) == 0:
+        if len(self) == 0:
             return None
         bigger, smaller = self.get_items_from_ids(bigger_id, smaller_id)
-        smaller = self.__items.get_item_by_id(smaller_id)
         uu = self.get(bigger, smaller)
         return uu
 
@@ -134,46 +243,73 @@ class VotesCache:
         self.add(bigger, smaller, bigger, timestamp)
 
     def load_from_csv(self, filename):
-        with open(filename, newline='', encoding='utf-8-sig') as csvfile:
+        """Replay votes from csv rows, returns the number of rows read (including duplicated or broken ones)."""
+        rows_read = 0
+        with open(filename, newline='', encoding='utf-8-sig') as csvfile, self.__store.transaction():
             spamreader = csv.DictReader(csvfile)
             for row in spamreader:
-                bigger_id = int(row[ItemPairVote.CsvFieldNames.item1_id])
-                smaller_id = int(row[ItemPairVote.CsvFieldNames.item2_id])
-                choice = row[ItemPairVote.CsvFieldNames.choice]
-                if ItemPairVote.CsvFieldNames.timestamp in row:
-                    timestamp = float(row[ItemPairVote.CsvFieldNames.timestamp])
-                else:
-                    timestamp = None
-                found = self.get_vote_from_pair(bigger_id, smaller_id)
-                if found is None:
-                    self.add_vote_from_ids(bigger_id, smaller_id, timestamp)
+                rows_read += 1
+                try:
+                    bigger_id = int(row[ItemPairVote.CsvFieldNames.item1_id])
+                    smaller_id = int(row[ItemPairVote.CsvFieldNames.item2_id])
+                    choice = row[ItemPairVote.CsvFieldNames.choice]
+                    if ItemPairVote.CsvFieldNames.timestamp in row:
+                        timestamp = float(row[ItemPairVote.CsvFieldNames.timestamp])
+                    else:
+                        timestamp = None
+                except (TypeError, ValueError):
+                    # incomplete row written by an interrupted run
+                    logging.warning("skipping broken vote row {} in {}".format(row, filename))
+                    continue
+                bigger = self.__items.find_item_by_id(bigger_id)
+                smaller = self.__items.find_item_by_id(smaller_id)
+                if bigger is None or smaller is None:
+                    # kept aside, the item can come back to the list
+                    self.__detached_rows.append(row)
+                    continue
+                if self.__graph is None and not self.__store.contains(bigger_id, smaller_id):
+                    # the graph is built from all the votes at once, on first use
+                    self.__store.add(ItemPairVote(bigger, smaller, bigger if choice == ">" else None, timestamp))
                 else:
-                    bigger, smaller = self.get_items_from_ids(bigger_id, smaller_id)
-                    found.add(bigger, smaller, choice, timestamp)
-        pass
+                    # a later row of a pair is a re-vote
+                    self.add(bigger, smaller, bigger if choice == ">" else None, timestamp)
+        return rows_read
 
     def __repr__(self):
-        return common_repr(f"{len(self.__votes)} elements")
+        return common_repr(f"{len(self)} elements")
+
+    def __len__(self):
+        return len(self.__store)
+
+    def get_detached_row_count(self) -> int:
+        """Rows read by load_from_csv for votes on items not in the list, not counted by len."""
+        return len(self.__detached_rows)
 
     def find_votes_not_matching_list(self, items: Items):
-        not_matches = []
-        for vote in self.__votes.values():
-            if not vote.matches_list(items):
-                not_matches.append(vote)
-        return not_matches
+        position_by_id = {item.get_id(): position for position, item in enumerate(items.get_wrapped_items())}
+        with METRICS.timer("find_votes_not_matching_list"):
+            return self.__store.find_votes_not_matching_positions(position_by_id)
 
     def enrich_items_with_stats(self, items: Items):
-        votes_not_matching = self.find_votes_not_matching_list(items)
+        conflicts_by_item_id = {}
+        for vote in self.find_votes_not_matching_list(items):
+            for item_id in (vote.get_item_1().get_id(), vote.get_item_2().get_id()):
+                conflicts_by_item_id[item_id] = conflicts_by_item_id.get(item_id, 0) + 1
+        bucket = 0
+        previous = None
         for item in items.get_wrapped_items():
-            cer = self.get_item_certainty(item)
-            un = self.get_item_uncertainty(item)
-            for vnm in votes_not_matching:
-                raise NotImplementedError()
+            cer, un = self.__store.get_item_vote_counts(item.get_id())
+            if previous is not None and self.get_inferred_cmp(item, previous) != 0:
+                bucket += 1
+            previous = item
             item.update("cer", cer)
             item.update("un", un)
+            item.update("bucket", bucket)
+            item.update("conflicts", conflicts_by_item_id.get(item.get_id(), 0))
 
     def has_certain_vote(self, item1, item2):
-        found_in_cache = self.get(item1, item2)
-        if found_in_cache is not None:
+        item1_id = item1.get_id()
+        item2_id = item2.get_id()
+        if self.__store.contains(item1_id, item2_id):
             return True
-        return False
+        return self.get_graph().compare_ids(item1_id, item2_id) is not None